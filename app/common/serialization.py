@@ -0,0 +1,45 @@
+"""
+Fast JSON responses: the content is encoded directly (orjson if available), FastAPI does not validate it again
+against the response_model. The content must already have the shape and field order of the response model.
+"""
+import json
+from datetime import date, datetime
+
+from starlette.responses import JSONResponse, Response
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    # dates as pydantic encodes them in the response models: ISO 8601, UTC as "Z"
+    if isinstance(value, (date, datetime)):
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    # same bytes as starlette's JSONResponse after the response_model encoding (compact separators, UTF-8 without
+    # escaping, pydantic dates)
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+                      default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def public_response(content, response: Response = None):
+    # FAST_SERIALIZATION: a Response is returned, FastAPI skips the response_model validation and encoding.
+    # <response>: response parameter of the endpoint, its headers are kept in both modes
+    if settings.FAST_SERIALIZATION:
+        return FastJSONResponse(content, headers=dict(response.headers) if response is not None else None)
+    return content
@@ -1,9 +1,91 @@
+import base64
+import csv
+import json
+from typing import AsyncIterator, Iterator, Optional, Tuple
+
 import bcrypt
 
 
-def get_hashed_text(plain_text: str) -> bytes:
-    return bcrypt.hashpw(plain_text.encode('utf8'), bcrypt.gensalt())
+def get_hashed_text(plain_text: str, rounds: int = 12) -> bytes:
+    return bcrypt.hashpw(plain_text.encode('utf8'), bcrypt.gensalt(rounds))
 
 
 def verify_hashed_text(plain_text: str, hashed_text: bytes) -> bool:
     return bcrypt.checkpw(plain_text.encode('utf8'), hashed_text)
+
+
+def get_hash_rounds(hashed_text: bytes) -> int:
+    # cost factor recorded in a bcrypt hash: $2b$<rounds>$<salt and hash>
+    if isinstance(hashed_text, str):
+        hashed_text = hashed_text.encode('ascii')
+    return int(hashed_text.split(b'$')[2])
+
+
+def encode_cursor(last_id: int) -> str:
+    # opaque cursor for keyset pagination
+    return base64.urlsafe_b64encode(json.dumps(dict(id=last_id)).encode('utf8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> int:
+    # raises ValueError if the cursor was not created by encode_cursor
+    try:
+        last_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))["id"]
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(last_id, int):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return last_id
+
+
+def chunks(values: list, size: int) -> Iterator[list]:
+    # consecutive slices of at most <size> values (i.e. to keep IN lists under the bound parameters limit)
+    for start in range(0, len(values), max(size, 1)):
+        yield values[start:start + size]
+
+
+def to_ndjson(items: list) -> str:
+    # one JSON document per line (newline delimited JSON)
+    return "".join(json.dumps(item) + "\n" for item in items)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    # splits a stream of bytes in lines without reading the whole stream in memory
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode('utf8').rstrip("\r")
+    if buffer:
+        yield buffer.decode('utf8').rstrip("\r")
+
+
+async def iter_ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[Optional[dict], Optional[str]]]:
+    # yields (record, error) for each non empty line of a NDJSON stream
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield None, f"Invalid JSON: {e}"
+            continue
+        if isinstance(record, dict):
+            yield record, None
+        else:
+            yield None, "Invalid JSON: an object was expected"
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[Optional[dict], Optional[str]]]:
+    # yields (record, error) for each non empty line of a CSV stream, the first line is the header
+    header = None
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [h.strip() for h in values]
+        elif len(values) != len(header):
+            yield None, f"Invalid CSV: {len(header)} values were expected, {len(values)} found"
+        else:
+            yield dict(zip(header, values)), None
@@ -0,0 +1,126 @@
+"""
+Admission control: requests of a limited route class (see ADMISSION_ROUTES in app.core.config) run at most
+max_concurrent at a time, the rest wait in a bounded FIFO queue. A request is rejected with 503 + Retry-After when
+the queue is full, when its estimated wait exceeds max_wait or when it waited max_wait without getting a slot.
+"""
+import asyncio
+import math
+import re
+import time
+from collections import deque
+from typing import List, Optional
+
+from fastapi import FastAPI
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+
+
+class RouteClass:
+
+    def __init__(self, name: str, methods: str, pattern: str, limits: tuple):
+        self.name = name
+        self.methods = set(m.strip().upper() for m in methods.split(","))
+        self.pattern = re.compile(pattern)
+        self.max_concurrent, self.max_queued, self.max_wait = limits
+        self.running = 0
+        self._waiters = deque()
+        # moving average of the time a request holds its slot
+        self.avg_seconds = 0.0
+        self.admitted = self.rejected = self.timed_out = 0
+
+    def matches(self, method: str, path: str) -> bool:
+        return method in self.methods and self.pattern.search(path) is not None
+
+    def estimated_wait(self) -> float:
+        return self.avg_seconds * (len(self._waiters) + 1) / self.max_concurrent
+
+    async def acquire(self) -> Optional[float]:
+        # None if the request was admitted, otherwise the estimated wait
+        if self.running < self.max_concurrent and not self._waiters:
+            self.running += 1
+            self.admitted += 1
+            return None
+        wait = self.estimated_wait()
+        if len(self._waiters) >= self.max_queued or wait > self.max_wait:
+            self.rejected += 1
+            return wait
+        slot = asyncio.get_running_loop().create_future()
+        self._waiters.append(slot)
+        try:
+            # release() hands its slot over to the first waiter (self.running does not change)
+            await asyncio.wait_for(slot, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self._pass_on(slot)
+            return self.estimated_wait()
+        except BaseException:
+            # cancelled, i.e. the client disconnected
+            self._pass_on(slot)
+            raise
+        finally:
+            if slot in self._waiters:
+                self._waiters.remove(slot)
+        self.admitted += 1
+        return None
+
+    def _pass_on(self, slot: asyncio.Future):
+        # the slot was handed over to this waiter just before it gave up: it goes to the next waiter (or is freed),
+        # otherwise that capacity would be lost for good
+        if slot.done() and not slot.cancelled():
+            self._hand_over()
+
+    def release(self, seconds: float):
+        self.avg_seconds += 0.2 * (seconds - self.avg_seconds)
+        self._hand_over()
+
+    def _hand_over(self):
+        while self._waiters:
+            slot = self._waiters.popleft()
+            if not slot.done():
+                slot.set_result(None)
+                return
+        self.running -= 1
+
+    def stats(self) -> dict:
+        return dict(name=self.name, running=self.running, queued=len(self._waiters),
+                    max_concurrent=self.max_concurrent, max_queued=self.max_queued, admitted=self.admitted,
+                    rejected=self.rejected, timed_out=self.timed_out, avg_seconds=self.avg_seconds)
+
+
+route_classes: List[RouteClass] = [RouteClass(name, methods, pattern, limits)
+                                   for name, (methods, pattern, limits) in settings.ADMISSION_ROUTES.items()]
+
+
+def stats() -> List[dict]:
+    return [c.stats() for c in route_classes]
+
+
+class AdmissionControlMiddleware:
+    # ASGI middleware: the slot is held until the whole response (including streamed bodies) is sent
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        route_class = None
+        if scope["type"] == "http":
+            route_class = next((c for c in route_classes if c.matches(scope["method"], scope["path"])), None)
+        if route_class is None:
+            return await self.app(scope, receive, send)
+        wait = await route_class.acquire()
+        if wait is not None:
+            response = JSONResponse(status_code=503, content=dict(error="Server busy, please retry later."),
+                                    headers={"Retry-After": str(max(1, math.ceil(wait)))})
+            return await response(scope, receive, send)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.release(time.perf_counter() - start)
+
+
+def admission_control(app: FastAPI):
+    # to be added before log_after_request, so rejected requests are also logged and measured
+    if settings.ADMISSION_CONTROL:
+        app.add_middleware(AdmissionControlMiddleware)
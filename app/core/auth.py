@@ -0,0 +1,36 @@
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import local_db
+from app.services import AuthService
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    scheme, _, token = (authorization or "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+
+
+def current_claims(authorization: str = Header(None), db: Session = Depends(local_db)) -> dict:
+    # claims of the bearer token: signature check + cached revocation and user status (no bcrypt, no query on hits)
+    token = bearer_token(authorization)
+    try:
+        if token is None:
+            raise ValueError("Missing bearer token")
+        return AuthService.authenticate(db, token)
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+
+def require_user(authorization: str = Header(None), db: Session = Depends(local_db)) -> Optional[str]:
+    # router dependency: public_id of the authenticated user, nothing is checked unless AUTH_REQUIRED
+    if not settings.AUTH_REQUIRED:
+        return None
+    return current_claims(authorization, db)["sub"]
+
+
+def require_authenticated(authorization: str = Header(None), db: Session = Depends(local_db)) -> str:
+    # router dependency: public_id of the authenticated user, checked even without AUTH_REQUIRED
+    return current_claims(authorization, db)["sub"]
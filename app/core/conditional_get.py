@@ -0,0 +1,25 @@
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.services import VersionService
+
+
+def conditional_get(db: Session, request: Request, response: Response, *names: str) \
+        -> Tuple[Optional[Response], Dict[str, int]]:
+    # sets the ETag of the response, returns a 304 response if the client already has this version
+    # (only the versions of the tables <names> are read, the ORM and the serializer are not used) and the versions,
+    # the body must be loaded at these versions (see UserService.get_all_public)
+    versions = VersionService.get_versions(db, *names)
+    return conditional_response(request, response, versions), versions
+
+
+def conditional_response(request: Request, response: Response, versions: Dict[str, int]) -> Optional[Response]:
+    # same as conditional_get for versions already read: they must be the versions of the body that is served
+    etag = VersionService.etag_of(f"{request.url.path}?{request.url.query}", versions)
+    if VersionService.is_not_modified(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
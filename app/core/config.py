@@ -14,10 +14,113 @@ else:
 load_dotenv(dotenv_path=env_path)
 
 
+def get_bool(name: str, default: bool = False) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_limits(name: str, default: str) -> tuple:
+    # "max_concurrent,max_queued,max_wait_seconds"
+    max_concurrent, max_queued, max_wait = os.getenv(name, default).split(",")
+    return int(max_concurrent), int(max_queued), float(max_wait)
+
+
 class Settings:
     PROJECT_NAME: str = os.getenv("PROJECT_NAME", "Not defined")
     PROJECT_VERSION: str = os.getenv("PROJECT_VERSION", "0.0.0")
     SQLALCHEMY_DATABASE_URL: str = os.getenv("SQLALCHEMY_DATABASE_URL", "sqlite:///./app.db")
+    # Async database path: endpoints run as coroutines over an async engine (aiosqlite for SQLite)
+    ASYNC_DB: bool = get_bool("ASYNC_DB", False)
+    SQLALCHEMY_ASYNC_DATABASE_URL: str = os.getenv("SQLALCHEMY_ASYNC_DATABASE_URL",
+                                                   SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1))
+
+    # number of rows read per query when exporting a whole table
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+    # password hashing (bcrypt) in a process pool: cost factor, pool size and max hashes submitted at once
+    # (0 means: calibrated with the first hash / number of CPUs / two per worker)
+    PASSWORD_HASH_ROUNDS: int = int(os.getenv("PASSWORD_HASH_ROUNDS", "0"))
+    # calibration: highest cost whose hash takes at most TARGET_MS on this host. No cost (calibrated or fixed) is
+    # below MIN_ROUNDS, the bcrypt default
+    PASSWORD_HASH_TARGET_MS: float = float(os.getenv("PASSWORD_HASH_TARGET_MS", "250"))
+    PASSWORD_HASH_MIN_ROUNDS: int = int(os.getenv("PASSWORD_HASH_MIN_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+    PASSWORD_HASH_MAX_IN_FLIGHT: int = int(os.getenv("PASSWORD_HASH_MAX_IN_FLIGHT", "0"))
+
+    # number of rows validated, hashed and inserted per transaction in bulk imports
+    BULK_CHUNK_SIZE: int = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+
+    # cache of users/roles by public_id (0 disables the cache)
+    CACHE_MAX_SIZE: int = int(os.getenv("CACHE_MAX_SIZE", "10000"))
+    CACHE_TTL_SECONDS: float = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+
+    # slow query log (opt-in): statements slower than the threshold are logged with their query plan
+    SLOW_QUERY_LOG: bool = get_bool("SLOW_QUERY_LOG", False)
+    SLOW_QUERY_THRESHOLD_MS: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+    SLOW_QUERY_TOP_N: int = int(os.getenv("SLOW_QUERY_TOP_N", "20"))
+
+    # responses are encoded directly from the query rows, without the response_model validation
+    FAST_SERIALIZATION: bool = get_bool("FAST_SERIALIZATION", False)
+
+    # schema initialization at startup: create | auto | check | none (see app.db.init_db)
+    SCHEMA_INIT: str = os.getenv("SCHEMA_INIT", "auto")
+
+    # authentication: signed tokens issued by POST /auth/login, required by the user/role routes if AUTH_REQUIRED
+    # and always by the admin routes. Without AUTH_SECRET_KEY a random key is used (tokens are only valid in this
+    # process)
+    AUTH_REQUIRED: bool = get_bool("AUTH_REQUIRED", False)
+    AUTH_SECRET_KEY: str = os.getenv("AUTH_SECRET_KEY", "")
+    AUTH_TOKEN_TTL_SECONDS: int = int(os.getenv("AUTH_TOKEN_TTL_SECONDS", "900"))
+    # cached user status (active or not) and max number of unexpired revoked tokens kept in memory (when reached,
+    # logins get 503 until some of them expire)
+    AUTH_STATUS_TTL_SECONDS: float = float(os.getenv("AUTH_STATUS_TTL_SECONDS", "30"))
+    AUTH_REVOCATION_MAX_SIZE: int = int(os.getenv("AUTH_REVOCATION_MAX_SIZE", "100000"))
+
+    # concurrent identical reads (same list page or public_id) share a single database call
+    COALESCE_READS: bool = get_bool("COALESCE_READS", True)
+
+    # unhandled exceptions: repetitions of an already logged error are summarized every interval
+    ERROR_SUMMARY_INTERVAL_SECONDS: float = float(os.getenv("ERROR_SUMMARY_INTERVAL_SECONDS", "60"))
+    ERROR_MAX_FINGERPRINTS: int = int(os.getenv("ERROR_MAX_FINGERPRINTS", "1000"))
+
+    # admission control (opt-in): each route class has its own concurrency limit and bounded queue, requests over
+    # the limits get 503 + Retry-After. route class -> (methods, path regex, limits), limits of a class can be
+    # changed with ADMISSION_<CLASS>=max_concurrent,max_queued,max_wait_seconds. Other routes are not limited
+    ADMISSION_CONTROL: bool = get_bool("ADMISSION_CONTROL", False)
+    ADMISSION_ROUTES: dict = {
+        "password": ("POST", r"^/(user/|users/bulk|auth/login)$", get_limits("ADMISSION_PASSWORD", "4,32,2")),
+        "writes": ("POST,DELETE", r"^/role/", get_limits("ADMISSION_WRITES", "8,64,2")),
+        "exports": ("GET", r"^/(users|roles)/export$", get_limits("ADMISSION_EXPORTS", "2,4,1")),
+    }
+
+    # group commit (opt-in): writes of concurrent requests are committed together by a single writer thread,
+    # a batch takes the writes queued during the window (see app.db.write_queue)
+    WRITE_QUEUE: bool = get_bool("WRITE_QUEUE", False)
+    WRITE_QUEUE_WINDOW_MS: float = float(os.getenv("WRITE_QUEUE_WINDOW_MS", "2"))
+    WRITE_QUEUE_MAX_BATCH: int = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "256"))
+
+    # read/write routing (opt-in, see app.db.session): reads keep DB_READ_POOL_SIZE connections open and open up
+    # to DB_READ_POOL_MAX_OVERFLOW more in bursts, writes use a single connection. Requests wait up to
+    # DB_READ_POOL_TIMEOUT / DB_WRITE_POOL_TIMEOUT seconds for a connection. A session keeps its read connection
+    # until it is closed: size + overflow must cover the requests in flight (see ADMISSION_CONTROL)
+    DB_READ_WRITE_ROUTING: bool = get_bool("DB_READ_WRITE_ROUTING", False)
+    DB_READ_POOL_SIZE: int = int(os.getenv("DB_READ_POOL_SIZE", "40"))
+    DB_READ_POOL_MAX_OVERFLOW: int = int(os.getenv("DB_READ_POOL_MAX_OVERFLOW", "60"))
+    DB_READ_POOL_TIMEOUT: float = float(os.getenv("DB_READ_POOL_TIMEOUT", "30"))
+    DB_WRITE_POOL_TIMEOUT: float = float(os.getenv("DB_WRITE_POOL_TIMEOUT", "30"))
+    # SQLite connection-setup profiles: "name=value;name=value" pragmas executed on every new connection.
+    # The write profile is used by the main engine (all the connections if there is no routing)
+    SQLITE_WRITE_PRAGMAS: str = os.getenv("SQLITE_WRITE_PRAGMAS", "")
+    SQLITE_READ_PRAGMAS: str = os.getenv("SQLITE_READ_PRAGMAS", "")
+
+    # batch-get endpoints: max public ids per request and per IN query
+    BATCH_GET_MAX_IDS: int = int(os.getenv("BATCH_GET_MAX_IDS", "1000"))
+    BATCH_GET_CHUNK_SIZE: int = int(os.getenv("BATCH_GET_CHUNK_SIZE", "500"))
+
+    # in-memory user -> role index for the permission checks (see app.services.MembershipService). Its version is
+    # compared with the database at most every MEMBERSHIP_INDEX_CHECK_SECONDS, the changes of other processes
+    # are seen after that delay
+    MEMBERSHIP_INDEX: bool = get_bool("MEMBERSHIP_INDEX", True)
+    MEMBERSHIP_INDEX_CHECK_SECONDS: float = float(os.getenv("MEMBERSHIP_INDEX_CHECK_SECONDS", "1"))
 
 
 settings = Settings()
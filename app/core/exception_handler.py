@@ -2,23 +2,96 @@ from fastapi import FastAPI
 from starlette import status
 from starlette.requests import Request
 from starlette.responses import JSONResponse
+from collections import OrderedDict
+from typing import List
+import hashlib
+import threading
+import time
 import traceback
 
 from app.common.DefaultLogger import configure_logger
+from app.core.config import settings
 
 log = configure_logger("errors.log")
 
+# headers that are not written to the log
+REDACTED_HEADERS = {"authorization", "cookie", "proxy-authorization"}
+
+
+def fingerprint(exc: BaseException) -> str:
+    # same exception type raised from the same stack -> same fingerprint (the message is not part of it)
+    frames = traceback.extract_tb(exc.__traceback__)
+    stack = "|".join(f"{f.filename}:{f.name}:{f.lineno}" for f in frames)
+    key = f"{type(exc).__module__}.{type(exc).__qualname__}|{stack}"
+    return hashlib.blake2b(key.encode("utf8"), digest_size=6).hexdigest()
+
+
+class ErrorAggregator:
+    """
+    The first occurrence of a fingerprint is logged in full, repetitions are only counted and logged as one
+    summary line per fingerprint every <interval> seconds. At most <max_fingerprints> are kept (LRU).
+    """
+
+    def __init__(self, interval: float, max_fingerprints: int):
+        self.interval = interval
+        self.max_fingerprints = max_fingerprints
+        self._errors = OrderedDict()
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def record(self, exc: BaseException, request: Request):
+        key = fingerprint(exc)
+        now = time.time()
+        with self._lock:
+            error = self._errors.get(key)
+            if error is not None:
+                error["count"] += 1
+                error["pending"] += 1
+                error["last_seen"] = now
+                self._errors.move_to_end(key)
+                self._schedule_flush()
+                return
+            frames = traceback.extract_tb(exc.__traceback__)
+            self._errors[key] = dict(fingerprint=key, type=type(exc).__name__, message=str(exc),
+                                     location=f"{frames[-1].filename}:{frames[-1].lineno}" if frames else None,
+                                     count=1, pending=0, first_seen=now, last_seen=now)
+            while len(self._errors) > self.max_fingerprints:
+                self._errors.popitem(last=False)
+        headers = {k: ("<redacted>" if k.lower() in REDACTED_HEADERS else v) for k, v in request.headers.items()}
+        details = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__, limit=-5))
+        # a single record: the lines of an error are not interleaved with other records
+        log.error(f"New exception [{key}]: {exc}\n{request.client} {request.method} {request.url}\n"
+                  f"{headers}\n{details}")
+
+    def _schedule_flush(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        # one summary line per fingerprint repeated since the last summary
+        with self._lock:
+            self._timer = None
+            pending = [dict(e) for e in self._errors.values() if e["pending"] > 0]
+            for e in self._errors.values():
+                e["pending"] = 0
+        for e in pending:
+            log.error(f"Exception [{e['fingerprint']}] {e['type']}: {e['message']} repeated {e['pending']} times "
+                      f"in the last {self.interval:g} s ({e['count']} in total)")
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            return [{k: v for k, v in e.items() if k != "pending"} for e in self._errors.values()]
+
+
+errors = ErrorAggregator(settings.ERROR_SUMMARY_INTERVAL_SECONDS, settings.ERROR_MAX_FINGERPRINTS)
+
 
 def define_handler_exception(app: FastAPI):
     # This dispatch all general Exceptions
     @app.exception_handler(Exception)
     async def default_handler_exception(request: Request, exc):
-        log.error(f"New exception: {exc}")
-        log.error(f"{request.client} ")
-        log.error(f"{request.method} {request.url}")
-        log.error(f"{request.headers}")
-        log.error(f"{traceback.format_exc(-5)}")
+        errors.record(exc, request)
         return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             content=dict(error=f"{exc}"))
-
-
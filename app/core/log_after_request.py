@@ -1,21 +1,30 @@
+import time
+
 from fastapi import FastAPI
-from starlette import status
 from starlette.requests import Request
-from starlette.responses import JSONResponse
-import traceback
 
 from app.common.DefaultLogger import configure_logger
+from app.core import metrics
 
 log = configure_logger("app_activity.log")
 
 
 def log_after_request(app: FastAPI):
-    # This logs any activity of the app
+    # This logs any activity of the app and records the request metrics (see app.core.metrics)
     @app.middleware("http")
     async def log_activity_for_this_call(request: Request, call_next):
-        response = await call_next(request)
-        log.info(f"{request.client.host}: {request.method} {request.url} [{response.status_code}]")
+        start = time.perf_counter()
+        db_stats = metrics.request_started(request.method)
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+        finally:
+            elapsed = time.perf_counter() - start
+            # route template (i.e. /user/{public_id}), raw paths would create a metric per entity
+            route = request.scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            metrics.request_finished(request.method, route_path, status_code, elapsed, db_stats)
+        log.info(f"{request.client.host}: {request.method} {request.url} [{status_code}] "
+                 f"{elapsed * 1000:.1f} ms, {db_stats.queries} queries")
         return response
-
-
-
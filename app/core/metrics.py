@@ -0,0 +1,136 @@
+"""
+Request metrics: per-route latency histograms, in-flight gauges, status counters and database time/query count
+per request. Rendered in the Prometheus text format by the /metrics endpoint.
+
+Request metrics are only updated from the event loop (log_after_request middleware), so they need no locks.
+Database statistics are collected in a per-request object (context variable) by the engine events and added to
+the route metrics when the request finishes.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+# upper bounds (seconds) of the latency buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # last position is the +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestDBStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# database statistics of the current request
+request_db_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("request_db_stats", default=None)
+
+# (method, route) -> metric
+latency: Dict[Tuple[str, str], Histogram] = dict()
+db_latency: Dict[Tuple[str, str], Histogram] = dict()
+db_queries: Dict[Tuple[str, str], int] = dict()
+# (method, route, status) -> count
+responses: Dict[Tuple[str, str, int], int] = dict()
+# method -> requests being processed
+in_flight: Dict[str, int] = dict()
+
+
+def request_started(method: str) -> RequestDBStats:
+    in_flight[method] = in_flight.get(method, 0) + 1
+    db_stats = RequestDBStats()
+    request_db_stats.set(db_stats)
+    return db_stats
+
+
+def request_finished(method: str, route: str, status: int, seconds: float, db_stats: RequestDBStats):
+    in_flight[method] -= 1
+    key = (method, route)
+    histogram = latency.get(key)
+    if histogram is None:
+        histogram = latency[key] = Histogram()
+        db_latency[key] = Histogram()
+        db_queries[key] = 0
+    histogram.observe(seconds)
+    db_latency[key].observe(db_stats.seconds)
+    db_queries[key] += db_stats.queries
+    responses[(method, route, status)] = responses.get((method, route, status), 0) + 1
+
+
+def instrument_engine(engine):
+    # adds the time and number of statements executed by <engine> to the statistics of the current request
+    # the start time is kept on the execution context of the statement (on the connection if there is none,
+    # overwritten by the next statement): nothing is left behind when a statement fails (no after_cursor_execute)
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        setattr(context if context is not None else conn, "_metrics_start", time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - getattr(context if context is not None else conn, "_metrics_start")
+        db_stats = request_db_stats.get()
+        if db_stats is not None:
+            db_stats.queries += 1
+            db_stats.seconds += elapsed
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels.items()) + "}"
+
+
+def _render_histogram(lines: List[str], name: str, metric: Dict[Tuple[str, str], Histogram]):
+    for (method, route), histogram in metric.items():
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {histogram.count}")
+
+
+def _render_gauges(lines: List[str], name: str, kind: str, description: str, values: Dict[str, float]):
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {kind}")
+    for label_text, value in values.items():
+        lines.append(f"{name}{label_text} {value}")
+
+
+def render(extra: Dict[str, List[Tuple[dict, float]]] = None) -> str:
+    """
+    Prometheus text format. <extra> adds gauges from other components: {metric_name: [(labels, value), ...]}
+    """
+    lines = ["# HELP http_request_duration_seconds Request latency by route",
+             "# TYPE http_request_duration_seconds histogram"]
+    _render_histogram(lines, "http_request_duration_seconds", dict(latency))
+    lines += ["# HELP http_request_db_duration_seconds Database time per request by route",
+              "# TYPE http_request_db_duration_seconds histogram"]
+    _render_histogram(lines, "http_request_db_duration_seconds", dict(db_latency))
+    _render_gauges(lines, "http_request_db_queries_total", "counter", "Statements executed by route",
+                   {_labels(method=m, route=r): v for (m, r), v in dict(db_queries).items()})
+    _render_gauges(lines, "http_responses_total", "counter", "Responses by route and status code",
+                   {_labels(method=m, route=r, status=s): v for (m, r, s), v in dict(responses).items()})
+    _render_gauges(lines, "http_requests_in_flight", "gauge", "Requests being processed",
+                   {_labels(method=m): v for m, v in dict(in_flight).items()})
+    for name, samples in (extra or dict()).items():
+        _render_gauges(lines, name, "gauge", name.replace("_", " ").capitalize(),
+                       {_labels(**sample_labels): value for sample_labels, value in samples})
+    return "\n".join(lines) + "\n"
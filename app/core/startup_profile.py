@@ -0,0 +1,59 @@
+"""
+Startup profile: time spent in each initialization phase of the application (see create_application).
+    python -m app.core.startup_profile
+prints a report with the import time of the modules (python -X importtime) and the initialization phases.
+"""
+import json
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import List
+
+from app import project_path
+
+_phases: List[dict] = []
+
+
+@contextmanager
+def phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append(dict(phase=name, ms=round((time.perf_counter() - start) * 1000, 3)))
+
+
+def phases() -> List[dict]:
+    return list(_phases)
+
+
+def profile(module: str = "app.main", top: int = 25) -> dict:
+    # imports <module> in a new interpreter, so nothing is already imported
+    code = f"import json, {module}; from app.core import startup_profile; print(json.dumps(startup_profile.phases()))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=project_path,
+                            capture_output=True, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append(dict(module=name.strip(), self_ms=int(self_us) / 1000, cumulative_ms=int(cumulative_us) / 1000))
+    # self time grouped by top level package (sqlalchemy, fastapi, app, ...)
+    packages = dict()
+    for i in imports:
+        package = i["module"].split(".")[0]
+        packages[package] = packages.get(package, 0.0) + i["self_ms"]
+    return dict(
+        total_import_ms=round(sum(packages.values()), 3),
+        packages=[dict(package=k, ms=round(v, 3))
+                  for k, v in sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:top]],
+        project_modules=sorted([i for i in imports if i["module"].startswith("app")],
+                               key=lambda i: i["cumulative_ms"], reverse=True)[:top],
+        initialization=json.loads(result.stdout.strip().splitlines()[-1]),
+    )
+
+
+if __name__ == "__main__":
+    print(json.dumps(profile(), indent=2))
@@ -0,0 +1,76 @@
+"""
+Database schema initialization, to be executed once per deployment:
+    python -m app.db.init_db
+At startup the application only compares the schema version (PRAGMA user_version in SQLite), see SCHEMA_INIT
+in app.core.config
+"""
+from typing import Optional
+
+from sqlalchemy import inspect, text
+
+from app.db.base import DBBaseClass
+from app.db.models.User import user_role
+from app.db.search_index import create_search_indexes
+from app.db.session import engine
+
+# increase it when the tables change: init_db creates/updates the schema to this version
+SCHEMA_VERSION = 4
+
+
+def get_schema_version(bind=engine) -> Optional[int]:
+    # None if the database does not support a schema version
+    if bind.dialect.name != "sqlite":
+        return None
+    with bind.connect() as conn:
+        return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def migrate_user_role(conn):
+    # schema < 4: user_role without primary key (duplicated pairs were possible), the table is rebuilt
+    if not inspect(conn).has_table("user_role") or inspect(conn).get_pk_constraint("user_role")["constrained_columns"]:
+        return
+    conn.execute(text("ALTER TABLE user_role RENAME TO user_role_old"))
+    user_role.create(conn)
+    conn.execute(text("INSERT OR IGNORE INTO user_role (user_id, role_id) SELECT user_id, role_id FROM user_role_old "
+                      "WHERE user_id IS NOT NULL AND role_id IS NOT NULL"))
+    conn.execute(text("DROP TABLE user_role_old"))
+
+
+def init_db(bind=engine) -> int:
+    # changes in existing tables (create_all only creates the missing ones)
+    if bind.dialect.name == "sqlite":
+        with bind.begin() as conn:
+            migrate_user_role(conn)
+    # generate automatically tables in database
+    # the corresponding tables must be imported in app.db.base.py
+    DBBaseClass.metadata.create_all(bind=bind)
+    if bind.dialect.name == "sqlite":
+        with bind.begin() as conn:
+            create_search_indexes(conn)
+            conn.execute(text(f"PRAGMA user_version = {SCHEMA_VERSION}"))
+    return SCHEMA_VERSION
+
+
+def ensure_schema(mode: str = "auto", bind=engine):
+    """
+    create: always runs init_db (previous behaviour)
+    auto: runs init_db only if the schema version is not the current one
+    check: raises an error if the schema version is not the current one (init_db must be run before)
+    none: nothing is checked
+    """
+    if mode == "none":
+        return
+    if mode == "create":
+        init_db(bind)
+        return
+    version = get_schema_version(bind)
+    if version == SCHEMA_VERSION:
+        return
+    if mode == "check":
+        raise RuntimeError(f"Database schema version is {version}, {SCHEMA_VERSION} was expected. "
+                           f"Run: python -m app.db.init_db")
+    init_db(bind)
+
+
+if __name__ == "__main__":
+    print(f"Database schema version: {init_db()}")
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String
+from app.db.base_class import DBBaseClass
+
+
+class EntityVersion(DBBaseClass):
+    # change counter per table, increased in the same transaction as the change (see VersionService)
+    __tablename__ = 'entity_version'
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Table, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, Table, ForeignKey, Index, PrimaryKeyConstraint
 from sqlalchemy.orm import relationship
 
 from app.common.util import get_hashed_text, verify_hashed_text
@@ -8,7 +8,10 @@ import uuid
 user_role = Table('user_role',
                   DBBaseClass.metadata,
                   Column('user_id', Integer, ForeignKey("user.id")),
-                  Column('role_id', Integer, ForeignKey("role.id")))
+                  Column('role_id', Integer, ForeignKey("role.id")),
+                  # members of a role: seek on the primary key, roles of a user: seek on the reverse index
+                  PrimaryKeyConstraint('role_id', 'user_id'),
+                  Index('ix_user_role_user_id_role_id', 'user_id', 'role_id'))
 
 
 class User(DBBaseClass):
@@ -36,7 +39,10 @@ class User(DBBaseClass):
         return verify_hashed_text(to_verify, self.hashed_password)
 
     def set_password(self, password: str):
-        self.hashed_password = get_hashed_text(password)
+        # same cost as the hashes of the hashing pool (calibrated on this host)
+        from app.services import HashingService
+
+        self.hashed_password = get_hashed_text(password, HashingService.rounds())
 
     def __str__(self):
         return f"{self.email} ({self.first_name} {self.last_name}) - {self.public_id}"
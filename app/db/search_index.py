@@ -0,0 +1,101 @@
+"""
+Full text search indexes (SQLite FTS5, trigram tokenizer) for substring search on users and roles.
+The FTS tables are external content tables over "user" and "role": they only keep the index, and triggers keep
+them in sync with every insert/update/delete. They are created by init_db (app.db.init_db).
+The trigram tokenizer needs SQLite 3.34: with an older library (or without FTS5) the indexes are not created and
+the searches scan the content tables with LIKE.
+"""
+from typing import Dict
+
+from sqlalchemy import column, inspect, literal_column, or_, table, text
+from sqlalchemy.exc import OperationalError
+
+# (FTS table, content table, indexed columns)
+SEARCH_INDEXES = [
+    ("user_search", "user", ("email", "first_name", "last_name")),
+    ("role_search", "role", ("name",)),
+]
+
+# the trigram tokenizer only uses the index for queries of at least 3 characters
+MIN_INDEXED_LENGTH = 3
+
+# database url -> the search indexes exist (see is_indexed)
+_indexed: Dict[str, bool] = dict()
+
+user_search = table("user_search", column("rowid"), column("email"), column("first_name"), column("last_name"))
+role_search = table("role_search", column("rowid"), column("name"))
+
+
+def _statements(fts: str, content: str, columns: tuple) -> list:
+    names = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{content}', content_rowid='id', "
+        f"tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON \"{content}\" BEGIN "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON \"{content}\" BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON \"{content}\" BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END",
+        # indexes the rows inserted before the index existed
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def trigram_supported(conn) -> bool:
+    # FTS5 and its trigram tokenizer are compiled in this SQLite library
+    try:
+        conn.execute(text("CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(x, tokenize='trigram')"))
+    except OperationalError:
+        return False
+    conn.execute(text("DROP TABLE temp.trigram_probe"))
+    return True
+
+
+def create_search_indexes(conn) -> bool:
+    # returns whether the indexes were created
+    supported = conn.dialect.name == "sqlite" and trigram_supported(conn)
+    if supported:
+        for fts, content, columns in SEARCH_INDEXES:
+            for statement in _statements(fts, content, columns):
+                conn.execute(text(statement))
+    _indexed[str(conn.engine.url)] = supported
+    return supported
+
+
+def is_indexed(bind) -> bool:
+    # the search indexes exist in the database of <bind> (checked once per database)
+    key = str(bind.url)
+    if key not in _indexed:
+        if bind.dialect.name != "sqlite":
+            _indexed[key] = False
+        else:
+            with bind.connect() as conn:
+                _indexed[key] = all(inspect(conn).has_table(fts) for fts, _, _ in SEARCH_INDEXES)
+    return _indexed[key]
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_filter(fts_table, columns: list, q: str):
+    """
+    Condition over <fts_table> for rows containing <q> (case insensitive) in any of <columns>.
+    Short queries can not use the trigram index, they are answered by a LIKE '%q%' scan of the FTS table.
+    """
+    if len(q) >= MIN_INDEXED_LENGTH:
+        # a FTS5 string (phrase) matches any substring with the trigram tokenizer
+        phrase = '"' + q.replace('"', '""') + '"'
+        return literal_column(fts_table.name).op("MATCH")(phrase)
+    return like_filter([fts_table.c[c] for c in columns], q)
+
+
+def like_filter(columns: list, q: str):
+    # LIKE '%q%' scan over <columns>: of the content table when the search indexes do not exist (and as benchmark
+    # baseline), of the FTS table for the short queries
+    pattern = "%" + _escape_like(q) + "%"
+    return or_(*[c.like(pattern, escape="\\") for c in columns])
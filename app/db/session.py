@@ -1,13 +1,105 @@
 # Configuration for SessionLocal to be used across the project
 # SQLALCHEMY_DATABASE_URL defines the connection to the database
-from typing import Generator
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from typing import AsyncGenerator, Dict, Generator
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.dml import UpdateBase
 from app.core.config import settings
+from app.core.metrics import instrument_engine
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def parse_pragmas(pragmas: str) -> Dict[str, str]:
+    # "journal_mode=WAL;synchronous=NORMAL" -> {"journal_mode": "WAL", "synchronous": "NORMAL"}
+    items = [p.split("=", 1) for p in pragmas.split(";") if p.strip()]
+    return {name.strip(): value.strip() for name, value in items}
+
+
+def apply_pragmas(engine, pragmas: str):
+    # connection-setup profile: the pragmas are executed on every new connection of <engine> (SQLite only)
+    profile = parse_pragmas(pragmas)
+    if engine.dialect.name != "sqlite" or not profile:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in profile.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def _instrument(engine):
+    # database time and query count per request (see app.core.metrics)
+    instrument_engine(engine)
+    if settings.SLOW_QUERY_LOG:
+        from app.db import slow_query_log
+
+        slow_query_log.instrument_engine(engine, settings.SLOW_QUERY_THRESHOLD_MS, settings.SLOW_QUERY_TOP_N)
+
+
+if settings.DB_READ_WRITE_ROUTING:
+    # a single write connection (writes of this process are serialized here instead of failing on the
+    # database lock) and a pool of read connections, both kept open (SQLite files use NullPool by default).
+    # The overflow of the read pool bounds the connections opened by a burst. A session keeps its read connection
+    # until local_db closes it, and that teardown needs a thread of the same pool as the requests waiting for
+    # connections: with more requests in flight than read connections, they wait until DB_READ_POOL_TIMEOUT
+    engine = create_engine(settings.SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False},
+                           poolclass=QueuePool, pool_size=1, max_overflow=0,
+                           pool_timeout=settings.DB_WRITE_POOL_TIMEOUT)
+    read_engine = create_engine(settings.SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False},
+                                poolclass=QueuePool, pool_size=settings.DB_READ_POOL_SIZE,
+                                max_overflow=settings.DB_READ_POOL_MAX_OVERFLOW,
+                                pool_timeout=settings.DB_READ_POOL_TIMEOUT)
+    apply_pragmas(read_engine, settings.SQLITE_READ_PRAGMAS)
+    _instrument(read_engine)
+else:
+    engine = create_engine(settings.SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+    read_engine = engine
+apply_pragmas(engine, settings.SQLITE_WRITE_PRAGMAS)
+_instrument(engine)
+# every engine of the process (i.e. to listen to all the statements)
+engines = [engine] if read_engine is engine else [engine, read_engine]
+
+
+class RoutingSession(Session):
+    """
+    Reads go to read_engine, writes (flushes and INSERT/UPDATE/DELETE statements) to engine. After the first write
+    the whole transaction stays on engine, so it reads its own changes.
+    """
+    _writing = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._writing or self._flushing or isinstance(clause, UpdateBase):
+            self._writing = True
+            return engine
+        return read_engine
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def end_writing(session, transaction):
+    if transaction.parent is None:
+        session._writing = False
+
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine,
+                            class_=RoutingSession if settings.DB_READ_WRITE_ROUTING else Session)
+
+# Async engine (optional): only created when ASYNC_DB is enabled, the async driver (i.e. aiosqlite)
+# is not needed otherwise
+async_engine = None
+AsyncSessionLocal = None
+if settings.ASYNC_DB:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    async_engine = create_async_engine(settings.SQLALCHEMY_ASYNC_DATABASE_URL,
+                                       connect_args={"check_same_thread": False})
+    # single engine: the write profile (WAL, busy_timeout...) applies to all its connections
+    apply_pragmas(async_engine.sync_engine, settings.SQLITE_WRITE_PRAGMAS)
+    instrument_engine(async_engine.sync_engine)
+    # expire_on_commit=False: attributes can not be lazy-loaded after commit in async mode
+    AsyncSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=async_engine,
+                                     class_=AsyncSession, expire_on_commit=False)
 
 
 # Define Database connection
@@ -17,3 +109,9 @@ def local_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+# Define async Database connection
+async def local_async_db() -> AsyncGenerator:
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,90 @@
+"""
+Slow query log (opt-in, SLOW_QUERY_LOG=true): times every cursor execute of the engine and records the statements
+slower than SLOW_QUERY_THRESHOLD_MS, with the shape of their parameters and the SQLite query plan.
+Slow statements are written to slow_queries.log and kept in an in-memory top-N table (see AdminEndpoint).
+"""
+import threading
+import time
+from typing import Dict, List
+
+from sqlalchemy import event
+
+from app.common.DefaultLogger import configure_logger
+
+log = configure_logger("slow_queries.log")
+
+# statement -> aggregated statistics of its slow executions
+_slow_queries: Dict[str, dict] = dict()
+_lock = threading.Lock()
+
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def parameters_shape(parameters, executemany: bool) -> str:
+    # types of the bound parameters, the values are not recorded
+    def shape(params) -> str:
+        if isinstance(params, dict):
+            return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+        return "(" + ", ".join(type(v).__name__ for v in params or ()) + ")"
+
+    if executemany:
+        return f"{len(parameters)} x {shape(parameters[0]) if parameters else '()'}"
+    return shape(parameters)
+
+
+def query_plan(cursor, statement: str, parameters, executemany: bool) -> List[str]:
+    # EXPLAIN QUERY PLAN through a new DBAPI cursor, it does not emit engine events
+    if not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return []
+    try:
+        params = parameters[0] if executemany and parameters else parameters
+        rows = cursor.connection.execute("EXPLAIN QUERY PLAN " + statement, params or ()).fetchall()
+        return [row[-1] for row in rows]
+    except Exception as e:
+        return [f"not available: {e}"]
+
+
+def record(statement: str, elapsed_ms: float, shape: str, plan: List[str], top_n: int):
+    with _lock:
+        entry = _slow_queries.get(statement)
+        if entry is None:
+            entry = _slow_queries[statement] = dict(statement=statement, count=0, total_ms=0.0, max_ms=0.0)
+        entry["count"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+        entry.update(last_ms=elapsed_ms, parameters=shape, plan=plan)
+        if len(_slow_queries) > top_n:
+            # keeps the top-N by max time
+            fastest = min(_slow_queries.values(), key=lambda e: e["max_ms"])
+            del _slow_queries[fastest["statement"]]
+
+
+def top() -> List[dict]:
+    with _lock:
+        return sorted((dict(e) for e in _slow_queries.values()), key=lambda e: e["max_ms"], reverse=True)
+
+
+def reset():
+    with _lock:
+        _slow_queries.clear()
+
+
+def instrument_engine(engine, threshold_ms: float, top_n: int = 20):
+    explain = engine.dialect.name == "sqlite"
+
+    # start time on the execution context (see app.core.metrics.instrument_engine): not left behind on errors
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        setattr(context if context is not None else conn, "_slow_query_start", time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context if context is not None else conn, "_slow_query_start")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms < threshold_ms:
+            return
+        shape = parameters_shape(parameters, executemany)
+        plan = query_plan(cursor, statement, parameters, executemany) if explain else []
+        record(statement, elapsed_ms, shape, plan, top_n)
+        log.warning(f"{elapsed_ms:.1f} ms: {' '.join(statement.split())} | parameters: {shape} | "
+                    f"plan: {'; '.join(plan)}")
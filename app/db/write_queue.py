@@ -0,0 +1,200 @@
+"""
+Group commit (optional, WRITE_QUEUE): write operations of concurrent requests are applied by a single writer
+thread, one transaction per batch. A batch takes every operation queued during WRITE_QUEUE_WINDOW_MS (at most
+WRITE_QUEUE_MAX_BATCH), each operation runs in its own SAVEPOINT so an error only discards that operation, and
+the batch is committed once (one fsync for all its rows).
+An operation is a function (session) -> result that must not commit. The returned ORM objects are detached
+after the commit (their attributes stay loaded).
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.common.DefaultLogger import configure_logger
+from app.core.config import settings
+from app.core.metrics import instrument_engine
+
+log = configure_logger("write_queue.log")
+
+Operation = Callable[[Session], Any]
+
+
+def _writer_engine(url: str):
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    if engine.dialect.name == "sqlite":
+        # pysqlite does not handle SAVEPOINT inside its own transactions: the transaction is started here,
+        # IMMEDIATE takes the write lock at the start of the batch instead of in the middle of it
+        @event.listens_for(engine, "connect")
+        def do_connect(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def do_begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+    # same connection-setup profile as the write engine of the sessions
+    from app.db.session import apply_pragmas
+
+    apply_pragmas(engine, settings.SQLITE_WRITE_PRAGMAS)
+    instrument_engine(engine)
+    return engine
+
+
+class WriteQueue(threading.Thread):
+
+    def __init__(self, url: str, window_seconds: float, max_batch: int):
+        super().__init__(name="write-queue", daemon=True)
+        self.url = url
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.running = False
+        # set if the writer thread stopped on an error: the operations get it instead of being queued
+        self.error: Optional[Exception] = None
+        self._start_lock = threading.Lock()
+        self._stats = dict(operations=0, failed=0, batches=0, failed_batches=0, commit_seconds=0.0)
+
+    def submit(self, operation: Operation) -> Future:
+        future = Future()
+        # under the lock: an operation is never queued after a failed writer took the pending ones (see _fail_pending)
+        with self._start_lock:
+            if self.error is not None:
+                self._stats["operations"] += 1
+                self._stats["failed"] += 1
+                future.set_exception(self.error)
+                return future
+            if not self.running:
+                self.running = True
+                self.start()
+            self.queue.put((operation, future))
+        return future
+
+    def _next_batch(self) -> Optional[list]:
+        item = self.queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch:
+            try:
+                item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                # stop after this batch
+                self.queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def run(self):
+        batch, session = [], None
+        try:
+            session = sessionmaker(autoflush=False, expire_on_commit=False, bind=_writer_engine(self.url))()
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                self._apply(session, batch)
+        except Exception as e:
+            # i.e. the writer engine can not be created (the errors of a batch are handled by _apply)
+            log.error(f"Write queue stopped: {e}")
+            self._fail_pending(e, batch)
+        finally:
+            if session is not None:
+                session.close()
+
+    def _fail_pending(self, error: Exception, batch: list):
+        # the operations of the current batch and the queued ones get the error instead of waiting forever
+        with self._start_lock:
+            self.error = error
+            pending = list(batch)
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    pending.append(item)
+        for _, future in pending:
+            if not future.done():
+                self._stats["operations"] += 1
+                self._stats["failed"] += 1
+                future.set_exception(error)
+
+    def _apply(self, session: Session, batch: list):
+        results = []
+        try:
+            for operation, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                savepoint = session.begin_nested()
+                try:
+                    result = operation(session)
+                    session.flush()
+                    savepoint.commit()
+                    results.append((future, result, None))
+                except Exception as e:
+                    savepoint.rollback()
+                    results.append((future, None, e))
+            start = time.perf_counter()
+            session.commit()
+            self._stats["commit_seconds"] += time.perf_counter() - start
+        except Exception as e:
+            # the whole batch is lost (i.e. the database is locked): every caller gets the error
+            log.error(f"Batch of {len(results)} operations failed: {e}")
+            session.rollback()
+            results = [(future, None, error or e) for future, _, error in results]
+            self._stats["failed_batches"] += 1
+        finally:
+            session.expunge_all()
+        self._stats["batches"] += 1
+        for future, result, error in results:
+            self._stats["operations"] += 1
+            if error is None:
+                future.set_result(result)
+            else:
+                self._stats["failed"] += 1
+                future.set_exception(error)
+
+    def stop(self, timeout: float = 5.0):
+        # pending operations are applied before the thread ends
+        if self.running:
+            self.queue.put(None)
+            self.join(timeout)
+            self.running = False
+
+    def stats(self) -> dict:
+        batches = self._stats["batches"]
+        return dict(self._stats, queued=self.queue.qsize(),
+                    avg_batch_size=self._stats["operations"] / batches if batches else 0.0)
+
+
+_writer = WriteQueue(settings.SQLALCHEMY_DATABASE_URL, settings.WRITE_QUEUE_WINDOW_MS / 1000,
+                     settings.WRITE_QUEUE_MAX_BATCH)
+
+
+def enabled() -> bool:
+    return settings.WRITE_QUEUE
+
+
+def run_sync(operation: Operation) -> Any:
+    # from a worker thread: waits until the batch of the operation is committed
+    return _writer.submit(operation).result()
+
+
+async def run(operation: Operation) -> Any:
+    return await asyncio.wrap_future(_writer.submit(operation))
+
+
+def stop():
+    _writer.stop()
+
+
+def stats() -> dict:
+    return _writer.stats()
@@ -0,0 +1,37 @@
+from typing import List
+
+from fastapi import APIRouter
+
+from app.core import startup_profile
+from app.core.exception_handler import errors
+from app.db import slow_query_log
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+@router.get('/slow-queries', response_model=List[dict])
+def get_slow_queries():
+    # top-N slow statements (empty unless SLOW_QUERY_LOG is enabled)
+    return slow_query_log.top()
+
+
+@router.delete('/slow-queries')
+def reset_slow_queries():
+    slow_query_log.reset()
+    return dict(result="Slow query table cleared.")
+
+
+@router.get('/errors', response_model=List[dict])
+def get_errors():
+    # unhandled exceptions by fingerprint with their counters
+    return errors.stats()
+
+
+@router.get('/startup', response_model=List[dict])
+def get_startup_profile():
+    # time of each initialization phase of this process
+    return startup_profile.phases()
@@ -0,0 +1,30 @@
+from fastapi import Depends, HTTPException, APIRouter
+from sqlalchemy.orm import Session
+
+from app.core.auth import current_claims
+from app.core.config import settings
+from app.db.session import local_db
+from app.schemas import AuthSchema
+from app.services import AuthService
+
+router = APIRouter(
+    prefix="/auth",
+    tags=["auth"],
+    responses={401: {"description": "Not authenticated"}},
+)
+
+
+@router.post('/login', response_model=AuthSchema.Token)
+async def login(credentials: AuthSchema.Login, db: Session = Depends(local_db)):
+    if not AuthService.can_issue_tokens():
+        raise HTTPException(status_code=503, detail="Too many revoked tokens, try again later.",
+                            headers={"Retry-After": "60"})
+    token = await AuthService.login(db, credentials.email, credentials.password)
+    if token is None:
+        raise HTTPException(status_code=401, detail="Invalid email or password.")
+    return dict(access_token=token, expires_in=settings.AUTH_TOKEN_TTL_SECONDS)
+
+
+@router.post('/logout', status_code=204)
+def logout(claims: dict = Depends(current_claims)):
+    AuthService.revoke(claims)
@@ -0,0 +1,58 @@
+from typing import List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends, HTTPException, APIRouter, Request, Response
+
+from app.common.serialization import public_response
+from app.core.conditional_get import conditional_response
+from app.db.session import local_async_db
+from app.schemas import RoleSchema
+from app.services import RoleAsyncService, UserAsyncService, VersionService
+
+router = APIRouter(
+    prefix="/role",
+    tags=["role"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+@router.post('/', response_model=RoleSchema.Public)
+async def create_role(role: RoleSchema.Create, db: AsyncSession = Depends(local_async_db)):
+    db_role = await RoleAsyncService.get_by_name(db, role.name)
+    if db_role:
+        raise HTTPException(status_code=400, detail="Email already registered.")
+
+    return (await RoleAsyncService.create(db=db, role=role)).to_dict()
+
+
+@router.get('s/', response_model=List[RoleSchema.Public])
+async def get_all_roles(request: Request, response: Response, skip: int = 0, limit: int = 100,
+                        db: AsyncSession = Depends(local_async_db)):
+    # same ETags as the sync endpoints (see app.core.conditional_get)
+    versions = await VersionService.get_versions_async(db, VersionService.ROLE)
+    not_modified = conditional_response(request, response, versions)
+    if not_modified:
+        return not_modified
+    roles = await RoleAsyncService.get_all(db, skip=skip, limit=limit)
+    return public_response([r.to_dict() for r in roles], response)
+
+
+@router.get('/{public_id}', response_model=RoleSchema.Public)
+async def get_by_public_id(public_id: str, db: AsyncSession = Depends(local_async_db)):
+    db_role = await RoleAsyncService.get_by_public_id(db, public_id=public_id)
+    if not db_role:
+        raise HTTPException(status_code=404, detail="Role not found.")
+
+    return db_role.to_dict()
+
+
+@router.post('/{public_role_id}/user/{public_user_id}', response_model=RoleSchema.Public)
+async def assign_role_to_user(public_role_id: str, public_user_id: str,
+                              db: AsyncSession = Depends(local_async_db)):
+    db_role = await RoleAsyncService.get_by_public_id(db, public_id=public_role_id)
+    db_user = await UserAsyncService.get_by_public_id(db, public_id=public_user_id)
+    if not db_role or not db_user:
+        entity = "Role" if not db_role else "User"
+        raise HTTPException(status_code=404, detail=f"{entity} not found.")
+    await RoleAsyncService.add_role_to_user(db, db_role, db_user)
+    return db_role.to_dict()
@@ -1,11 +1,16 @@
 from typing import List
 
 from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, APIRouter
+from fastapi import Depends, HTTPException, APIRouter, Query, Request, Response
+from starlette.responses import StreamingResponse
 
-from app.db.session import local_db
-from app.schemas import RoleSchema
-from app.services import RoleService, UserService
+from app.common.serialization import public_response
+from app.common.util import decode_cursor, encode_cursor, to_ndjson
+from app.core.conditional_get import conditional_get
+from app.core.config import settings
+from app.db.session import SessionLocal, local_db
+from app.schemas import RoleSchema, UserSchema
+from app.services import RoleService, UserService, VersionService
 
 router = APIRouter(
     prefix="/role",
@@ -23,27 +28,112 @@ def create_role(role: RoleSchema.Create, db: Session = Depends(local_db)):
     return RoleService.create(db=db, role=role).to_dict()
 
 
+@router.post('s/batch-get', response_model=RoleSchema.BatchResult)
+def batch_get_roles(public_ids: List[str], db: Session = Depends(local_db)):
+    # up to BATCH_GET_MAX_IDS roles in one request, missing ids are listed in not_found
+    if len(public_ids) > settings.BATCH_GET_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_GET_MAX_IDS} ids per request.")
+    roles, not_found = RoleService.get_public_by_public_ids(db, public_ids)
+    return public_response(dict(items=roles, not_found=not_found))
+
+
 @router.get('s/', response_model=List[RoleSchema.Public])
-def get_all_roles(skip: int = 0, limit: int = 100, db: Session = Depends(local_db)):
-    roles = RoleService.get_all(db, skip=skip, limit=limit)
-    return [r.to_dict() for r in roles]
+def get_all_roles(request: Request, response: Response, skip: int = 0, limit: int = 100,
+                  db: Session = Depends(local_db)):
+    not_modified, versions = conditional_get(db, request, response, VersionService.ROLE)
+    if not_modified:
+        return not_modified
+    return public_response(RoleService.get_all_public(db, skip=skip, limit=limit, versions=versions), response)
+
+
+@router.get('s/search', response_model=List[RoleSchema.Public])
+def search_roles(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(20, ge=1, le=100),
+                 db: Session = Depends(local_db)):
+    # substring search on the role name
+    return public_response(RoleService.search_public(db, q, limit))
+
+
+@router.get('s/page', response_model=RoleSchema.Page)
+def get_roles_page(cursor: str = None, limit: int = 100, db: Session = Depends(local_db)):
+    try:
+        after_id = decode_cursor(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    roles, next_id = RoleService.get_page_public(db, after_id=after_id, limit=limit)
+    return public_response(dict(items=roles, next_cursor=encode_cursor(next_id) if next_id is not None else None))
+
+
+@router.get('s/export')
+def export_roles():
+    # the stream outlives the request dependencies, therefore it uses its own session
+    def ndjson_lines():
+        with SessionLocal() as db:
+            for roles in RoleService.iter_all_public(db, batch_size=settings.EXPORT_BATCH_SIZE):
+                yield to_ndjson(roles)
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
 
 
 @router.get('/{public_id}', response_model=RoleSchema.Public)
 def get_by_public_id(public_id: str, db: Session = Depends(local_db)):
-    db_role = RoleService.get_by_public_id(db, public_id=public_id)
-    if not db_role:
+    role = RoleService.get_public_by_public_id(db, public_id=public_id)
+    if not role:
         raise HTTPException(status_code=404, detail="Role not found.")
 
-    return db_role.to_dict()
+    return public_response(role)
 
 
 @router.post('/{public_role_id}/user/{public_user_id}', response_model=RoleSchema.Public)
 def assign_role_to_user(public_role_id: str, public_user_id: str, db: Session = Depends(local_db)):
-    db_role = RoleService.get_by_public_id(db, public_id=public_role_id)
-    db_user = UserService.get_by_public_id(db, public_id=public_user_id)
-    if not db_role or not db_user:
-        entity = "Role" if not db_role else "User"
+    role = RoleService.get_cached_by_public_id(db, public_id=public_role_id)
+    user = UserService.get_cached_by_public_id(db, public_id=public_user_id)
+    if not role or not user:
+        entity = "Role" if not role else "User"
         raise HTTPException(status_code=404, detail=f"{entity} not found.")
-    RoleService.add_role_to_user(db, db_role, db_user)
-    return db_role.to_dict()
+    RoleService.add_role_to_users(db, role.id, {public_user_id: user.id})
+    return role.public
+
+
+def _update_role_members(db: Session, public_role_id: str, public_user_ids: List[str], assign: bool) -> dict:
+    role = RoleService.get_cached_by_public_id(db, public_id=public_role_id)
+    if not role:
+        raise HTTPException(status_code=404, detail="Role not found.")
+    public_user_ids = list(dict.fromkeys(public_user_ids))
+    user_ids = UserService.get_ids_by_public_ids(db, public_user_ids)
+    if assign:
+        changed = RoleService.add_role_to_users(db, role.id, user_ids)
+    else:
+        changed = RoleService.remove_role_from_users(db, role.id, user_ids)
+    return dict(public_id=public_role_id, changed=changed, unchanged=len(user_ids) - changed,
+                not_found=[p for p in public_user_ids if p not in user_ids])
+
+
+@router.get('/{public_role_id}/users', response_model=UserSchema.Page)
+def get_role_members(public_role_id: str, cursor: str = None, limit: int = 100, db: Session = Depends(local_db)):
+    role = RoleService.get_cached_by_public_id(db, public_id=public_role_id)
+    if not role:
+        raise HTTPException(status_code=404, detail="Role not found.")
+    try:
+        after_id = decode_cursor(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    users, next_id = RoleService.get_members_page_public(db, role.id, after_id=after_id, limit=limit)
+    return public_response(dict(items=users, next_cursor=encode_cursor(next_id) if next_id is not None else None))
+
+
+@router.get('/{public_role_id}/users/count', response_model=RoleSchema.MembersCount)
+def count_role_members(public_role_id: str, db: Session = Depends(local_db)):
+    role = RoleService.get_cached_by_public_id(db, public_id=public_role_id)
+    if not role:
+        raise HTTPException(status_code=404, detail="Role not found.")
+    return dict(public_id=public_role_id, count=RoleService.count_members(db, role.id))
+
+
+@router.post('/{public_role_id}/users', response_model=RoleSchema.MembershipReport)
+def assign_role_to_users(public_role_id: str, public_user_ids: List[str], db: Session = Depends(local_db)):
+    return _update_role_members(db, public_role_id, public_user_ids, assign=True)
+
+
+@router.delete('/{public_role_id}/users', response_model=RoleSchema.MembershipReport)
+def revoke_role_from_users(public_role_id: str, public_user_ids: List[str], db: Session = Depends(local_db)):
+    return _update_role_members(db, public_role_id, public_user_ids, assign=False)
@@ -0,0 +1,51 @@
+from typing import List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends, HTTPException, APIRouter, Request, Response
+
+from app.common.serialization import public_response
+from app.core.conditional_get import conditional_response
+from app.db.session import local_async_db
+from app.schemas import UserSchema
+from app.services import UserAsyncService, VersionService
+
+router = APIRouter(
+    prefix="/user",
+    tags=["user"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+@router.post('/', response_model=UserSchema.Public)
+async def create_user(user: UserSchema.Create, db: AsyncSession = Depends(local_async_db)):
+    db_user = await UserAsyncService.get_by_email(db, email=user.email)
+    if db_user:
+        raise HTTPException(status_code=400, detail="Email already registered.")
+
+    return (await UserAsyncService.create(db=db, user=user)).to_dict()
+
+
+@router.get('s/', response_model=List[UserSchema.Public])
+async def get_all_users(request: Request, response: Response, skip: int = 0, limit: int = 100,
+                        db: AsyncSession = Depends(local_async_db)):
+    # same ETags as the sync endpoints (see app.core.conditional_get)
+    versions = await VersionService.get_versions_async(db, VersionService.USER)
+    not_modified = conditional_response(request, response, versions)
+    if not_modified:
+        return not_modified
+    return public_response(await UserAsyncService.get_all_public(db, skip=skip, limit=limit), response)
+
+
+@router.get('/{public_id}', response_model=UserSchema.Public)
+async def get_by_public_id(public_id: str, request: Request, response: Response,
+                           db: AsyncSession = Depends(local_async_db)):
+    # the version is read before the user, the user must exist before answering If-None-Match: *
+    versions = await VersionService.get_versions_async(db, VersionService.USER)
+    db_user = await UserAsyncService.get_by_public_id(db, public_id=public_id)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found.")
+    not_modified = conditional_response(request, response, versions)
+    if not_modified:
+        return not_modified
+
+    return public_response(db_user.to_dict(), response)
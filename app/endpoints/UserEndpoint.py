@@ -1,11 +1,17 @@
 from typing import List
 
 from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, APIRouter
+from fastapi import Depends, HTTPException, APIRouter, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
 
-from app.db.session import local_db
+from app.common.serialization import public_response
+from app.common.util import decode_cursor, encode_cursor, to_ndjson, iter_csv_records, iter_ndjson_records
+from app.core.conditional_get import conditional_get, conditional_response
+from app.core.config import settings
+from app.db.session import SessionLocal, local_db
 from app.schemas import UserSchema
-from app.services import UserService
+from app.services import MembershipService, UserService, VersionService
 
 router = APIRouter(
     prefix="/user",
@@ -15,24 +21,96 @@ router = APIRouter(
 
 
 @router.post('/', response_model=UserSchema.Public)
-def create_user(user: UserSchema.Create, db: Session = Depends(local_db)):
-    db_user = UserService.get_by_email(db, email=user.email)
+async def create_user(user: UserSchema.Create, db: Session = Depends(local_db)):
+    # async: the request does not hold a worker thread while the password is hashed
+    db_user = await run_in_threadpool(UserService.get_by_email, db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered.")
 
-    return UserService.create(db=db, user=user).to_dict()
+    db_user = await UserService.create(db=db, user=user)
+    return await run_in_threadpool(db_user.to_dict)
+
+
+@router.post('s/bulk', response_model=UserSchema.BulkReport)
+async def bulk_create_users(request: Request, db: Session = Depends(local_db)):
+    # body: NDJSON (default) or CSV (Content-Type: text/csv) with the fields of UserSchema.Create
+    if request.headers.get("content-type", "").startswith("text/csv"):
+        records = iter_csv_records(request.stream())
+    else:
+        records = iter_ndjson_records(request.stream())
+    results = await UserService.bulk_create(db, records, chunk_size=settings.BULK_CHUNK_SIZE)
+    created = sum(1 for r in results if r["status"] == "created")
+    return dict(created=created, failed=len(results) - created, results=results)
+
+
+@router.post('s/batch-get', response_model=UserSchema.BatchResult)
+def batch_get_users(public_ids: List[str], db: Session = Depends(local_db)):
+    # up to BATCH_GET_MAX_IDS users in one request, missing ids are listed in not_found
+    if len(public_ids) > settings.BATCH_GET_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_GET_MAX_IDS} ids per request.")
+    users, not_found = UserService.get_public_by_public_ids(db, public_ids)
+    return public_response(dict(items=users, not_found=not_found))
 
 
 @router.get('s/', response_model=List[UserSchema.Public])
-def get_all_users(skip: int = 0, limit: int = 100, db: Session = Depends(local_db)):
-    users = UserService.get_all(db, skip=skip, limit=limit)
-    return [u.to_dict() for u in users]
+def get_all_users(request: Request, response: Response, skip: int = 0, limit: int = 100,
+                  db: Session = Depends(local_db)):
+    not_modified, versions = conditional_get(db, request, response, VersionService.USER)
+    if not_modified:
+        return not_modified
+    return public_response(UserService.get_all_public(db, skip=skip, limit=limit, versions=versions), response)
+
+
+@router.get('s/search', response_model=List[UserSchema.Public])
+def search_users(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(20, ge=1, le=100),
+                 db: Session = Depends(local_db)):
+    # substring search on email, first and last name
+    return public_response(UserService.search_public(db, q, limit))
+
+
+@router.get('s/page', response_model=UserSchema.Page)
+def get_users_page(cursor: str = None, limit: int = 100, db: Session = Depends(local_db)):
+    try:
+        after_id = decode_cursor(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    users, next_id = UserService.get_page_public(db, after_id=after_id, limit=limit)
+    return public_response(dict(items=users, next_cursor=encode_cursor(next_id) if next_id is not None else None))
+
+
+@router.get('s/export')
+def export_users():
+    # the stream outlives the request dependencies, therefore it uses its own session
+    def ndjson_lines():
+        with SessionLocal() as db:
+            for users in UserService.iter_all_public(db, batch_size=settings.EXPORT_BATCH_SIZE):
+                yield to_ndjson(users)
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
 
 
 @router.get('/{public_id}', response_model=UserSchema.Public)
-def get_by_public_id(public_id: str, db: Session = Depends(local_db)):
-    db_user = UserService.get_by_public_id(db, public_id=public_id)
-    if not db_user:
+def get_by_public_id(public_id: str, request: Request, response: Response, db: Session = Depends(local_db)):
+    # the cached user is at least at the version of the ETag, and must exist before answering If-None-Match: *
+    versions = VersionService.get_versions(db, VersionService.USER)
+    user = UserService.get_public_by_public_id(db, public_id=public_id, version=versions[VersionService.USER])
+    if not user:
         raise HTTPException(status_code=404, detail="User not found.")
+    not_modified = conditional_response(request, response, versions)
+    if not_modified:
+        return not_modified
 
-    return db_user.to_dict()
+    return public_response(user, response)
+
+
+@router.get('/{public_id}/roles/{role}', response_model=UserSchema.RoleCheck)
+def check_role(public_id: str, role: str, db: Session = Depends(local_db)):
+    # <role>: name or public id. Answered from the membership index, the user id comes from the users cache
+    user = UserService.get_cached_by_public_id(db, public_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found.")
+    role_id = MembershipService.get_role_id(db, role)
+    if role_id is None:
+        raise HTTPException(status_code=404, detail="Role not found.")
+    return public_response(dict(public_id=public_id, role=role,
+                                has_role=MembershipService.has_role(db, user.id, role_id)))
@@ -1,45 +1,99 @@
-import uvicorn
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
+from starlette.responses import PlainTextResponse
+
+from app.core import startup_profile
 
 # import general settings
-from app.core.log_after_request import log_after_request
-from app.core.config import settings
-from app.core.exception_handler import define_handler_exception
+with startup_profile.phase("import settings and middleware"):
+    from app.core.log_after_request import log_after_request
+    from app.core import admission_control
+    from app.core.config import settings
+    from app.core.exception_handler import define_handler_exception, errors
+    from app.core import metrics
 
 # import endpoints
-from app.endpoints import UserEndpoint, RoleEndpoint
+with startup_profile.phase("import endpoints"):
+    from app.core.auth import require_authenticated, require_user
+    from app.endpoints import UserEndpoint, RoleEndpoint, AdminEndpoint, AuthEndpoint
 
 # import database models:
-from app.db.session import engine
-from app.db.base import DBBaseClass
+with startup_profile.phase("import database"):
+    from app.db.init_db import ensure_schema
+    from app.db import write_queue
+    from app.services import AuthService, CacheService, HashingService, MembershipService
 
 
 def include_routes(app):
     # To include EndPoints:
-    app.include_router(UserEndpoint.router)
-    app.include_router(RoleEndpoint.router)
+    # a bearer token is required if AUTH_REQUIRED (see app.core.auth)
+    protected = [Depends(require_user)]
+    if settings.ASYNC_DB:
+        # async endpoints are registered first, so they take precedence over their sync versions
+        from app.endpoints import UserAsyncEndpoint, RoleAsyncEndpoint
+        app.include_router(UserAsyncEndpoint.router, dependencies=protected)
+        app.include_router(RoleAsyncEndpoint.router, dependencies=protected)
+    app.include_router(UserEndpoint.router, dependencies=protected)
+    app.include_router(RoleEndpoint.router, dependencies=protected)
+    # admin routes expose SQL text and exception messages: a token is always required
+    app.include_router(AdminEndpoint.router, dependencies=[Depends(require_authenticated)])
+    app.include_router(AuthEndpoint.router)
+
+
+def include_metrics(app):
+    # Prometheus metrics of the requests, the hashing pool and the caches
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    def get_metrics():
+        extra = dict(
+            password_hashing=[(dict(stat=k), v) for k, v in HashingService.stats().items()],
+            password_rehash=[(dict(stat=k), v) for k, v in AuthService.rehash_stats.items()],
+            cache=[(dict(cache=c["name"], stat=k), v) for c in CacheService.stats()
+                   for k, v in c.items() if k != "name"],
+            errors_total=[(dict(fingerprint=e["fingerprint"], type=e["type"]), e["count"]) for e in errors.stats()],
+            admission=[(dict(route_class=c["name"], stat=k), v) for c in admission_control.stats()
+                       for k, v in c.items() if k != "name"],
+            write_queue=[(dict(stat=k), v) for k, v in write_queue.stats().items()],
+            read_coalescing=[(dict(flight=f["name"], stat=k), v) for f in CacheService.coalescing_stats()
+                             for k, v in f.items() if k != "name"],
+            membership_index=[(dict(stat=k), v) for k, v in MembershipService.stats().items()],
+        )
+        return metrics.render(extra)
 
 
 def create_tables():
-    # generate automatically tables in database
-    # the corresponding tables must be imported in app.db.base.py
-    DBBaseClass.metadata.create_all(bind=engine)
+    # the schema is created by: python -m app.db.init_db, here it is only checked/created if needed
+    # (see SCHEMA_INIT in app.core.config)
+    ensure_schema(settings.SCHEMA_INIT)
 
 
 def define_loggers(app):
     # adds general handler exception if something was not controled
     define_handler_exception(app)
+    # adds concurrency limits per route class (see ADMISSION_ROUTES in app.core.config)
+    admission_control.admission_control(app)
     # adds logger for requests
     log_after_request(app)
 
 
+def define_events(app):
+    @app.on_event("shutdown")
+    def release_resources():
+        # the hashing process pool is released with the application, pending writes are committed
+        HashingService.shutdown()
+        write_queue.stop()
+
+
 def create_application() -> FastAPI:
-    app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION)
-    define_loggers(app)
-    include_routes(app)
-    create_tables()
+    with startup_profile.phase("create application"):
+        app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION)
+    with startup_profile.phase("define loggers"):
+        define_loggers(app)
+    with startup_profile.phase("include routes"):
+        include_routes(app)
+        include_metrics(app)
+    with startup_profile.phase("schema check"):
+        create_tables()
+    define_events(app)
     return app
 
 
 api = create_application()
-
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class Login(BaseModel):
+    email: str
+    password: str
+
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 
@@ -12,3 +14,25 @@ class Create(Base):
 
 class Public(Base):
     public_id: str
+
+
+class Page(BaseModel):
+    items: List[Public]
+    next_cursor: Optional[str] = None
+
+
+class BatchResult(BaseModel):
+    items: List[Public]
+    not_found: List[str]
+
+
+class MembersCount(BaseModel):
+    public_id: str
+    count: int
+
+
+class MembershipReport(BaseModel):
+    public_id: str
+    changed: int
+    unchanged: int
+    not_found: List[str]
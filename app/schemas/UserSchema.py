@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, EmailStr
 
@@ -16,3 +16,33 @@ class Create(Base):
 class Public(Base):
     public_id: str
     roles: List[dict]
+
+
+class Page(BaseModel):
+    items: List[Public]
+    next_cursor: Optional[str] = None
+
+
+class BatchResult(BaseModel):
+    items: List[Public]
+    not_found: List[str]
+
+
+class RoleCheck(BaseModel):
+    public_id: str
+    role: str
+    has_role: bool
+
+
+class BulkResult(BaseModel):
+    row: int
+    status: str
+    email: Optional[str] = None
+    public_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkReport(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkResult]
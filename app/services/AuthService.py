@@ -0,0 +1,132 @@
+# Signed short-lived tokens: bcrypt runs once at login, each request only checks an HMAC signature
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.common.DefaultLogger import configure_logger
+from app.core.config import settings
+from app.db.models.User import User
+from app.db.session import SessionLocal
+from app.services import CacheService, HashingService, UserService
+
+log = configure_logger("auth.log")
+
+if settings.AUTH_SECRET_KEY:
+    _key = settings.AUTH_SECRET_KEY.encode("utf8")
+else:
+    log.warning("AUTH_SECRET_KEY is not defined, tokens are signed with a random key of this process")
+    _key = secrets.token_bytes(32)
+
+# compared against when the email does not exist, so both cases take the time of a bcrypt check
+_dummy_hash: Optional[bytes] = None
+
+# rehash of the passwords stored with an outdated cost: pending tasks (by user id) and results
+_rehashing: Dict[int, asyncio.Task] = dict()
+rehash_stats = dict(started=0, completed=0, skipped=0, failed=0)
+
+
+def _b64encode(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(_key, payload.encode("utf8"), hashlib.sha256).digest())
+
+
+def issue_token(public_id: str, ttl_seconds: int = None) -> str:
+    ttl_seconds = settings.AUTH_TOKEN_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+    claims = dict(sub=public_id, exp=int(time.time()) + ttl_seconds, jti=secrets.token_hex(8))
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf8"))
+    return f"{payload}.{_sign(payload)}"
+
+
+def decode_token(token: str) -> dict:
+    # raises ValueError if the token was not issued by this service or has expired
+    payload, _, signature = token.partition(".")
+    if not signature or not hmac.compare_digest(signature.encode("utf8"), _sign(payload).encode("utf8")):
+        raise ValueError("Invalid token signature")
+    try:
+        claims = json.loads(_b64decode(payload))
+    except Exception as e:
+        raise ValueError("Invalid token payload") from e
+    if claims["exp"] <= time.time():
+        raise ValueError("Token has expired")
+    return claims
+
+
+def revoke(claims: dict):
+    # kept until the token would have expired anyway
+    CacheService.revoked_tokens.revoke(claims["jti"], claims["exp"])
+
+
+def can_issue_tokens() -> bool:
+    # False while AUTH_REVOCATION_MAX_SIZE unexpired tokens are revoked: revocations are never dropped, so the
+    # new logins wait for some of them to expire
+    return not CacheService.revoked_tokens.is_full()
+
+
+def is_active(db: Session, public_id: str) -> bool:
+    # status of the user, cached for AUTH_STATUS_TTL_SECONDS
+    def load() -> Optional[bool]:
+        active = db.execute(select(User.is_active).filter(User.public_id == public_id)).scalar()
+        return bool(active) if active is not None else None
+
+    return bool(CacheService.user_status.get_or_load(public_id, load))
+
+
+def authenticate(db: Session, token: str) -> dict:
+    # claims of a valid token, raises ValueError otherwise
+    claims = decode_token(token)
+    if CacheService.revoked_tokens.is_revoked(claims["jti"]):
+        raise ValueError("Token has been revoked")
+    if not is_active(db, claims["sub"]):
+        raise ValueError("User is not active")
+    return claims
+
+
+async def login(db: Session, email: str, password: str) -> Optional[str]:
+    # token for valid credentials of an active user, None otherwise
+    global _dummy_hash
+    user = await run_in_threadpool(UserService.get_by_email, db, email)
+    if user is None:
+        if _dummy_hash is None:
+            _dummy_hash = await HashingService.hash_text(secrets.token_hex(8))
+        await HashingService.verify_text(password, _dummy_hash)
+        return None
+    if not await HashingService.verify_text(password, user.hashed_password) or not user.is_active:
+        return None
+    if await HashingService.needs_rehash(user.hashed_password) and user.id not in _rehashing:
+        # in the background: the login does not wait for a second bcrypt
+        _rehashing[user.id] = asyncio.create_task(_rehash(user.id, password, user.hashed_password))
+        rehash_stats["started"] += 1
+    return issue_token(user.public_id)
+
+
+def _replace_hash(user_id: int, old_hash: bytes, new_hash: bytes) -> bool:
+    with SessionLocal() as db:
+        return UserService.replace_hashed_password(db, user_id, old_hash, new_hash)
+
+
+async def _rehash(user_id: int, password: str, old_hash: bytes):
+    try:
+        new_hash = await HashingService.hash_text(password)
+        replaced = await run_in_threadpool(_replace_hash, user_id, old_hash, new_hash)
+        rehash_stats["completed" if replaced else "skipped"] += 1
+    except Exception as e:
+        rehash_stats["failed"] += 1
+        log.warning(f"Password rehash failed for user {user_id}: {e}")
+    finally:
+        _rehashing.pop(user_id, None)
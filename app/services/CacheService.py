@@ -0,0 +1,217 @@
+# In-process read-through cache for the public representation of users and roles
+import heapq
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+
+# cached value: internal id (to be used in further queries), the immutable public representation and the entity
+# version it was loaded at (see VersionService, used to detect changes made by other processes)
+Entry = namedtuple("Entry", ["id", "public", "version"], defaults=(None,))
+
+
+class FrozenDict(dict):
+    # a dict that can not be modified, cached values are shared between requests
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("Cached values are immutable, use dict(value) to get a copy")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # concurrent calls with the same key share a single execution of the function and its result
+    # (the shared result must not be modified by the callers)
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = dict()
+        self._lock = threading.Lock()
+        self.calls = self.executions = 0
+
+    def do(self, key, function: Callable[[], Any]) -> Any:
+        if not settings.COALESCE_READS:
+            return function()
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        return dict(name=self.name, calls=self.calls, executions=self.executions,
+                    coalesced=self.calls - self.executions,
+                    ratio=(self.calls - self.executions) / self.calls if self.calls else 0.0)
+
+
+class TTLCache:
+    # bounded LRU cache, entries also expire after ttl_seconds
+
+    def __init__(self, name: str, max_size: int, ttl_seconds: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # changes on every invalidation, a value loaded before an invalidation is not stored
+        self._generation = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        # concurrent misses of the same key are loaded once
+        self.loads = SingleFlight(name)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, generation: int = None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader: Callable[[], Optional[Any]]) -> Optional[Any]:
+        # read-through: loader() is called on a miss, None values are not cached
+        value = self.get(key)
+        if value is None:
+            generation = self._generation
+            # the generation is part of the key: a miss after an invalidation does not join an older load
+            value = self.loads.do((key, generation), loader)
+            if value is not None:
+                self.set(key, value, generation)
+        return value
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return dict(name=self.name, size=len(self._data), max_size=self.max_size, ttl_seconds=self.ttl_seconds,
+                    hits=self.hits, misses=self.misses, evictions=self.evictions, invalidations=self.invalidations)
+
+
+class RevocationList:
+    # revoked token ids, each one kept until its token expires: an entry is never evicted before that (the tokens
+    # would be valid again). is_full(): max_size unexpired revocations, no more tokens should be issued
+
+    def __init__(self, name: str, max_size: int):
+        self.name = name
+        self.max_size = max_size
+        # token id -> expiration (epoch seconds), and a heap of (expiration, token id) to drop the expired ones
+        self._expires = dict()
+        self._heap = []
+        self._lock = threading.Lock()
+        self.revocations = self.expired = self.rejected = 0
+
+    def _purge(self, now: float):
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self._heap)
+            if self._expires.get(key) == expires_at:
+                del self._expires[key]
+                self.expired += 1
+
+    def revoke(self, key, expires_at: float):
+        # always accepted, also when full: the token is already issued
+        with self._lock:
+            self._purge(time.time())
+            if key not in self._expires:
+                self._expires[key] = expires_at
+                heapq.heappush(self._heap, (expires_at, key))
+                self.revocations += 1
+
+    def is_revoked(self, key) -> bool:
+        expires_at = self._expires.get(key)
+        return expires_at is not None and expires_at > time.time()
+
+    def is_full(self) -> bool:
+        with self._lock:
+            self._purge(time.time())
+            full = len(self._expires) >= self.max_size
+            if full:
+                self.rejected += 1
+            return full
+
+    def stats(self) -> dict:
+        return dict(name=self.name, size=len(self._expires), max_size=self.max_size, revocations=self.revocations,
+                    expired=self.expired, rejected_logins=self.rejected)
+
+
+# caches by public_id
+users = TTLCache("users", settings.CACHE_MAX_SIZE, settings.CACHE_TTL_SECONDS)
+roles = TTLCache("roles", settings.CACHE_MAX_SIZE, settings.CACHE_TTL_SECONDS)
+# authentication: user status (is_active) by public_id and revoked tokens by token id
+user_status = TTLCache("user_status", settings.CACHE_MAX_SIZE, settings.AUTH_STATUS_TTL_SECONDS)
+revoked_tokens = RevocationList("revoked_tokens", settings.AUTH_REVOCATION_MAX_SIZE)
+
+
+# list reads, their keys include the generation of the cache invalidated by the writes of that table
+reads = SingleFlight("reads")
+
+
+def stats() -> list:
+    return [users.stats(), roles.stats(), user_status.stats(), revoked_tokens.stats()]
+
+
+def coalescing_stats() -> list:
+    return [reads.stats()] + [c.loads.stats() for c in (users, roles, user_status)]
@@ -0,0 +1,174 @@
+# Password hashing service: bcrypt runs in a bounded process pool instead of the request path
+import asyncio
+import multiprocessing
+import os
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.common.DefaultLogger import configure_logger
+from app.common.util import get_hash_rounds, get_hashed_text, verify_hashed_text
+from app.core.config import settings
+
+log = configure_logger("hashing.log")
+
+# bcrypt accepts costs up to 31
+MAX_ROUNDS = 31
+
+_pool: ProcessPoolExecutor = None
+# the semaphore belongs to the event loop where it was created
+_semaphore: asyncio.Semaphore = None
+_semaphore_loop: asyncio.AbstractEventLoop = None
+
+_stats = dict(waiting=0, in_flight=0, completed=0, failed=0, wait_seconds=0.0, hash_seconds=0.0)
+# cost used for new hashes and the measurement it comes from (see calibrate)
+_calibration = dict(rounds=0, calibrated=0, target_ms=0.0, floor_rounds=0, floor_hash_ms=0.0, expected_hash_ms=0.0)
+_calibrating: asyncio.Task = None
+
+
+def _fixed_rounds() -> dict:
+    # a fixed cost is never below the floor
+    rounds = max(settings.PASSWORD_HASH_ROUNDS, settings.PASSWORD_HASH_MIN_ROUNDS)
+    if rounds != settings.PASSWORD_HASH_ROUNDS:
+        log.warning(f"PASSWORD_HASH_ROUNDS={settings.PASSWORD_HASH_ROUNDS} is below the minimum cost, "
+                    f"PASSWORD_HASH_MIN_ROUNDS={rounds} is used")
+    _calibration.update(rounds=rounds, calibrated=0, floor_rounds=settings.PASSWORD_HASH_MIN_ROUNDS)
+    return dict(_calibration)
+
+
+def _measure(floor: int, samples: int) -> float:
+    # seconds of a hash at the floor cost (best of <samples>), executed by a pool worker or in this process
+    elapsed = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        get_hashed_text(secrets.token_hex(8), floor)
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+
+def _calibrated_rounds(floor: int, floor_seconds: float) -> dict:
+    # each extra round doubles the time of a hash
+    target = settings.PASSWORD_HASH_TARGET_MS / 1000
+    rounds = floor
+    while rounds < MAX_ROUNDS and floor_seconds * 2 ** (rounds + 1 - floor) <= target:
+        rounds += 1
+    _calibration.update(rounds=rounds, calibrated=1, target_ms=target * 1000, floor_rounds=floor,
+                        floor_hash_ms=round(floor_seconds * 1000, 3),
+                        expected_hash_ms=round(floor_seconds * 2 ** (rounds - floor) * 1000, 3))
+    log.info(f"bcrypt cost calibrated: {_calibration}")
+    return dict(_calibration)
+
+
+def calibrate(samples: int = 2) -> dict:
+    # PASSWORD_HASH_ROUNDS=0: measures a hash at the floor cost on this host and picks the highest cost under
+    # PASSWORD_HASH_TARGET_MS. The pool workers run on the same host, so the measurement holds for them
+    if settings.PASSWORD_HASH_ROUNDS:
+        return _fixed_rounds()
+    floor = settings.PASSWORD_HASH_MIN_ROUNDS
+    return _calibrated_rounds(floor, _measure(floor, samples))
+
+
+async def calibrate_async(samples: int = 2) -> dict:
+    # same as calibrate, the measurement runs in the hashing pool: the event loop is not blocked
+    if settings.PASSWORD_HASH_ROUNDS:
+        return _fixed_rounds()
+    floor = settings.PASSWORD_HASH_MIN_ROUNDS
+    return _calibrated_rounds(floor, await _run(_measure, floor, samples))
+
+
+def rounds() -> int:
+    # cost of the new hashes, calibrated on first use (not at startup: it takes two hashes at the floor cost)
+    if not _calibration["rounds"]:
+        calibrate()
+    return _calibration["rounds"]
+
+
+async def rounds_async() -> int:
+    # same as rounds(), concurrent first calls share one calibration in the hashing pool
+    global _calibrating
+    if not _calibration["rounds"]:
+        loop = asyncio.get_running_loop()
+        if _calibrating is None or _calibrating.done() or _calibrating.get_loop() is not loop:
+            _calibrating = loop.create_task(calibrate_async())
+        # a cancelled caller does not cancel the calibration of the others
+        await asyncio.shield(_calibrating)
+    return _calibration["rounds"]
+
+
+async def needs_rehash(hashed_text: bytes) -> bool:
+    # hashed with a lower cost than the current one (never rehashed to a lower cost)
+    return get_hash_rounds(hashed_text) < await rounds_async()
+
+
+def max_workers() -> int:
+    return settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+
+
+def max_in_flight() -> int:
+    return settings.PASSWORD_HASH_MAX_IN_FLIGHT or 2 * max_workers()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # created at request time, when the process already runs other threads (log writer, write queue,
+        # threadpool): forkserver workers do not inherit locks held by those threads at fork time
+        _pool = ProcessPoolExecutor(max_workers=max_workers(), mp_context=multiprocessing.get_context("forkserver"))
+    return _pool
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore, _semaphore_loop = asyncio.Semaphore(max_in_flight()), loop
+    return _semaphore
+
+
+async def _run(func, *args):
+    # at most max_in_flight() hashes are submitted to the pool, the rest wait here (queue depth)
+    loop = asyncio.get_running_loop()
+    queued_at = loop.time()
+    _stats["waiting"] += 1
+    acquired = False
+    try:
+        async with _get_semaphore():
+            _stats["waiting"] -= 1
+            acquired = True
+            _stats["in_flight"] += 1
+            started_at = loop.time()
+            _stats["wait_seconds"] += started_at - queued_at
+            try:
+                result = await loop.run_in_executor(_get_pool(), func, *args)
+                _stats["completed"] += 1
+                return result
+            except Exception:
+                _stats["failed"] += 1
+                raise
+            finally:
+                _stats["in_flight"] -= 1
+                _stats["hash_seconds"] += loop.time() - started_at
+    finally:
+        if not acquired:
+            # cancelled while waiting for a slot
+            _stats["waiting"] -= 1
+
+
+async def hash_text(plain_text: str) -> bytes:
+    return await _run(get_hashed_text, plain_text, await rounds_async())
+
+
+async def verify_text(plain_text: str, hashed_text: bytes) -> bool:
+    return await _run(verify_hashed_text, plain_text, hashed_text)
+
+
+def stats() -> dict:
+    return dict(_stats, max_workers=max_workers(), max_in_flight=max_in_flight(),
+                **{f"calibration_{k}": v for k, v in _calibration.items()})
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
@@ -0,0 +1,172 @@
+# In-process index of the user -> role memberships (user_role table): permission checks without queries
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.Role import Role
+from app.db.models.User import user_role
+from app.services import VersionService
+
+
+class MembershipIndex:
+    # one bitset per role over the user ids: the integer primary keys are dense, so the bit of a user is its id
+    # (1M users and 20 roles ~ 2.5 MB). Built from user_role on the first check, then updated incrementally by
+    # the services that change memberships (after their commit). The index is at a version of the membership
+    # counter (VersionService.MEMBERSHIP), compared with the database every MEMBERSHIP_INDEX_CHECK_SECONDS: a
+    # difference is a change made by another process, and the index is rebuilt
+
+    def __init__(self):
+        self._bits: Dict[int, bytearray] = dict()
+        # role name and role public id -> role id
+        self._roles: Dict[str, int] = dict()
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        # builds and updates are serialized, checks only read the current structures
+        self._lock = threading.Lock()
+        self.checks = self.version_checks = self.builds = self.updates = 0
+        self.build_seconds = 0.0
+
+    def build(self, db: Session, version: int = None, batch_size: int = 50000):
+        # holds the lock while reading: a change committed during the build is applied after it (see add/remove).
+        # <version> is read before the memberships, so the index is never older than its version
+        with self._lock:
+            if version is None:
+                version = VersionService.get_versions(db, VersionService.MEMBERSHIP)[VersionService.MEMBERSHIP]
+            elif version == self._version:
+                # built by a concurrent request
+                return
+            start = time.perf_counter()
+            roles = {r.id: r for r in db.execute(select(Role.id, Role.name, Role.public_id))}
+            bits = {role_id: bytearray() for role_id in roles}
+            result = db.execute(select(user_role.c.role_id, user_role.c.user_id)
+                                .execution_options(stream_results=True))
+            for partition in result.partitions(batch_size):
+                for role_id, user_id in partition:
+                    _set(bits.setdefault(role_id, bytearray()), user_id)
+            self._roles = {key: r.id for r in roles.values() for key in (r.name, r.public_id)}
+            self._bits = bits
+            self._version = version
+            self._checked_at = time.monotonic()
+            self.builds += 1
+            self.build_seconds = time.perf_counter() - start
+
+    def ensure_built(self, db: Session):
+        # one primary key lookup at most every MEMBERSHIP_INDEX_CHECK_SECONDS, a rebuild if the version differs
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < settings.MEMBERSHIP_INDEX_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        self.version_checks += 1
+        version = VersionService.get_versions(db, VersionService.MEMBERSHIP)[VersionService.MEMBERSHIP]
+        if version != self._version:
+            self.build(db, version)
+
+    def role_id(self, role: str) -> Optional[int]:
+        # <role>: name (as stored, capitalized) or public id
+        return self._roles.get(role, self._roles.get(role.capitalize()))
+
+    def has_role(self, user_id: int, role_id: int) -> bool:
+        self.checks += 1
+        bits = self._bits.get(role_id)
+        return bits is not None and _test(bits, user_id)
+
+    def add_role(self, role_id: int, name: str, public_id: str):
+        with self._lock:
+            if self._version is not None:
+                self._bits.setdefault(role_id, bytearray())
+                self._roles.update({name: role_id, public_id: role_id})
+
+    def _advance(self, version: int):
+        # <version>: the membership version after a change of this process. Only the next version is applied,
+        # if another change came in between the index stays behind and is rebuilt at the next version check
+        if version == self._version + 1:
+            self._version = version
+
+    def add(self, role_id: int, user_ids: Iterable[int], version: int):
+        with self._lock:
+            # not built yet: the first build reads the committed change
+            if self._version is not None:
+                bits = self._bits.setdefault(role_id, bytearray())
+                for user_id in user_ids:
+                    _set(bits, user_id)
+                self._advance(version)
+                self.updates += 1
+
+    def remove(self, role_id: int, user_ids: Iterable[int], version: int):
+        with self._lock:
+            if self._version is not None:
+                bits = self._bits.get(role_id, bytearray())
+                for user_id in user_ids:
+                    _clear(bits, user_id)
+                self._advance(version)
+                self.updates += 1
+
+    def clear(self):
+        with self._lock:
+            self._bits, self._roles, self._version = dict(), dict(), None
+
+    def stats(self) -> dict:
+        return dict(roles=len(self._bits), memberships=sum(_count(b) for b in self._bits.values()),
+                    bytes=sum(len(b) for b in self._bits.values()), version=self._version or 0, checks=self.checks,
+                    version_checks=self.version_checks, builds=self.builds, updates=self.updates,
+                    build_seconds=round(self.build_seconds, 3))
+
+
+def _set(bits: bytearray, position: int):
+    index = position >> 3
+    if index >= len(bits):
+        # grows with some headroom, new users get the next ids
+        bits.extend(bytes(index - len(bits) + 1 + len(bits) // 8))
+    bits[index] |= 1 << (position & 7)
+
+
+def _clear(bits: bytearray, position: int):
+    index = position >> 3
+    if index < len(bits):
+        bits[index] &= ~(1 << (position & 7)) & 0xFF
+
+
+def _test(bits: bytearray, position: int) -> bool:
+    index = position >> 3
+    return index < len(bits) and bool(bits[index] >> (position & 7) & 1)
+
+
+def _count(bits: bytearray) -> int:
+    return int.from_bytes(bits, "little").bit_count()
+
+
+index = MembershipIndex()
+
+
+def get_role_id(db: Session, role: str) -> Optional[int]:
+    # <role>: name or public id, None if the role does not exist
+    if settings.MEMBERSHIP_INDEX:
+        index.ensure_built(db)
+        role_id = index.role_id(role)
+        if role_id is not None:
+            return role_id
+    # new roles do not change the membership version: a role created by another process is looked up here
+    row = db.execute(select(Role.id, Role.name, Role.public_id)
+                     .filter((Role.name == role.capitalize()) | (Role.public_id == role))).first()
+    if row is None:
+        return None
+    if settings.MEMBERSHIP_INDEX:
+        index.add_role(row.id, row.name, row.public_id)
+    return row.id
+
+
+def has_role(db: Session, user_id: int, role_id: int) -> bool:
+    if settings.MEMBERSHIP_INDEX:
+        index.ensure_built(db)
+        return index.has_role(user_id, role_id)
+    # single lookup on the primary key of user_role
+    return db.execute(select(user_role.c.user_id)
+                      .filter(user_role.c.role_id == role_id, user_role.c.user_id == user_id)).first() is not None
+
+
+def stats() -> dict:
+    return index.stats()
@@ -0,0 +1,56 @@
+# Async versions of RoleService, to be used with AsyncSessionLocal
+from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas import RoleSchema
+from app.db.models.Role import Role
+from app.db.models.User import User
+from app.services import CacheService, MembershipService, VersionService
+
+
+async def get_by_id(db: AsyncSession, user_id: int) -> Role:
+    result = await db.execute(select(Role).filter(Role.id == user_id))
+    return result.scalars().first()
+
+
+async def get_by_name(db: AsyncSession, name: str) -> Role:
+    result = await db.execute(select(Role).filter(Role.name == name.capitalize()))
+    return result.scalars().first()
+
+
+async def get_by_public_id(db: AsyncSession, public_id: str) -> Role:
+    result = await db.execute(select(Role).filter(Role.public_id == public_id))
+    return result.scalars().first()
+
+
+async def get_all(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[Role]:
+    result = await db.execute(select(Role).offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+async def create(db: AsyncSession, role: RoleSchema.Create) -> Role:
+    db_role = Role(**role.dict())
+    db.add(db_role)
+    await db.execute(VersionService.bump_statement(VersionService.ROLE))
+    await db.commit()
+    await db.refresh(db_role)
+    CacheService.roles.invalidate(db_role.public_id)
+    MembershipService.index.add_role(db_role.id, db_role.name, db_role.public_id)
+    return db_role
+
+
+async def add_role_to_user(db: AsyncSession, db_role: Role, db_user: User) -> User:
+    # db_user.roles must be already loaded (see UserAsyncService.get_by_public_id)
+    if db_role not in db_user.roles:
+        db_user.roles.append(db_role)
+    db.add(db_user)
+    await db.execute(VersionService.bump_statement(VersionService.USER))
+    await db.execute(VersionService.bump_statement(VersionService.MEMBERSHIP))
+    version = (await VersionService.get_versions_async(db, VersionService.MEMBERSHIP))[VersionService.MEMBERSHIP]
+    await db.commit()
+    CacheService.users.invalidate(db_user.public_id)
+    CacheService.roles.invalidate(db_role.public_id)
+    MembershipService.index.add(db_role.id, [db_user.id], version)
+    # expire_on_commit=False: db_user keeps its (updated) roles collection
+    return db_user
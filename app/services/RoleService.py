@@ -1,9 +1,15 @@
-from typing import List
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+from sqlalchemy import func, literal, select
 from sqlalchemy.orm import Session
 
+from app.common.util import chunks
+from app.core.config import settings
 from app.schemas import RoleSchema
+from app.db import write_queue
 from app.db.models.Role import Role
-from app.db.models.User import User
+from app.db.models.User import User, user_role
+from app.db.search_index import is_indexed, like_filter, role_search, search_filter
+from app.services import CacheService, MembershipService, UserService, VersionService
 
 
 def get_by_id(db: Session, user_id: int) -> Role:
@@ -18,22 +24,178 @@ def get_by_public_id(db: Session, public_id: str) -> Role:
     return db.query(Role).filter(Role.public_id == public_id).first()
 
 
+def public_roles_statement(skip: int = 0, limit: int = 100, after_id: int = None):
+    # light projection: only the columns needed to build the public representation
+    statement = select(Role.id, Role.public_id, Role.name, Role.description).order_by(Role.id)
+    if after_id is not None:
+        # keyset pagination: seeks directly in the primary key index, no rows are skipped
+        return statement.filter(Role.id > after_id).limit(limit)
+    return statement.offset(skip).limit(limit)
+
+
+def to_public_dict(row) -> dict:
+    # same fields as Role.to_dict, in the order of RoleSchema.Public
+    return dict(name=row.name, description=row.description, public_id=row.public_id)
+
+
+def get_cached_by_public_id(db: Session, public_id: str) -> Optional[CacheService.Entry]:
+    # read-through cache: (id, immutable public representation)
+    def load() -> Optional[CacheService.Entry]:
+        row = db.execute(public_roles_statement(limit=1).filter(Role.public_id == public_id)).first()
+        if row is None:
+            return None
+        return CacheService.Entry(row.id, CacheService.freeze(to_public_dict(row)))
+
+    return CacheService.roles.get_or_load(public_id, load)
+
+
+def get_public_by_public_id(db: Session, public_id: str) -> Optional[dict]:
+    entry = get_cached_by_public_id(db, public_id)
+    return entry.public if entry is not None else None
+
+
+def get_public_by_public_ids(db: Session, public_ids: List[str]) -> Tuple[List[dict], List[str]]:
+    # roles in the order of <public_ids> and the public ids that do not exist (one IN query per chunk)
+    public_ids = list(dict.fromkeys(public_ids))
+    found = dict()
+    for chunk in chunks(public_ids, settings.BATCH_GET_CHUNK_SIZE):
+        rows = db.execute(select(Role.public_id, Role.name, Role.description).filter(Role.public_id.in_(chunk)))
+        found.update((r.public_id, to_public_dict(r)) for r in rows)
+    return [found[p] for p in public_ids if p in found], [p for p in public_ids if p not in found]
+
+
 def get_all(db: Session, skip: int = 0, limit: int = 100) -> List[Role]:
     return db.query(Role).offset(skip).limit(limit).all()
 
 
-def create(db: Session, role: RoleSchema.Create) -> Role:
+def get_all_public(db: Session, skip: int = 0, limit: int = 100, versions: Dict[str, int] = None) -> List[dict]:
+    # <versions>: see UserService.get_all_public
+    def load() -> List[dict]:
+        return [to_public_dict(r) for r in db.execute(public_roles_statement(skip, limit))]
+
+    # concurrent requests of the same page at the same versions share one execution
+    if versions is None:
+        versions = VersionService.get_versions(db, VersionService.ROLE)
+    return CacheService.reads.do(("roles", skip, limit, tuple(versions.items())), load)
+
+
+def get_page_public(db: Session, after_id: int = 0, limit: int = 100) -> Tuple[List[dict], Optional[int]]:
+    # keyset pagination: returns the page after <after_id> and the id to continue from (None if last page)
+    limit = max(limit, 1)
+    rows = db.execute(public_roles_statement(limit=limit + 1, after_id=after_id)).all()
+    next_id = rows[limit - 1].id if len(rows) > limit else None
+    return [to_public_dict(r) for r in rows[:limit]], next_id
+
+
+def search_statement(q: str, limit: int = 20, indexed: bool = True):
+    # roles containing <q> in the name, in the order of the search index
+    statement = select(Role.id, Role.public_id, Role.name, Role.description)
+    if not indexed:
+        return statement.filter(like_filter([Role.name], q)).order_by(Role.id).limit(limit)
+    return statement.join(role_search, role_search.c.rowid == Role.id) \
+        .filter(search_filter(role_search, ["name"], q)).order_by(role_search.c.rowid).limit(limit)
+
+
+def search_public(db: Session, q: str, limit: int = 20) -> List[dict]:
+    return [to_public_dict(r) for r in db.execute(search_statement(q, limit, is_indexed(db.bind)))]
+
+
+def iter_all_public(db: Session, batch_size: int = 1000) -> Generator[List[dict], None, None]:
+    # walks the whole table in keyset batches, only one batch is kept in memory
+    after_id = 0
+    while after_id is not None:
+        roles, after_id = get_page_public(db, after_id=after_id, limit=batch_size)
+        if roles:
+            yield roles
+
+
+def get_members_page_public(db: Session, role_id: int, after_id: int = 0, limit: int = 100) \
+        -> Tuple[List[dict], Optional[int]]:
+    # keyset pagination over the primary key (role_id, user_id): only the rows of the page are read
+    limit = max(limit, 1)
+    statement = select(User.id, User.public_id, User.email, User.first_name, User.last_name) \
+        .join(user_role, user_role.c.user_id == User.id) \
+        .filter(user_role.c.role_id == role_id, user_role.c.user_id > after_id) \
+        .order_by(user_role.c.user_id).limit(limit + 1)
+    user_rows = db.execute(statement).all()
+    next_id = user_rows[limit - 1].id if len(user_rows) > limit else None
+    user_rows = user_rows[:limit]
+    role_rows = db.execute(UserService.user_roles_statement([u.id for u in user_rows])).all() if user_rows else []
+    return UserService.to_public_dicts(user_rows, role_rows), next_id
+
+
+def count_members(db: Session, role_id: int) -> int:
+    # counted on the primary key index, no user is read
+    return db.execute(select(func.count()).select_from(user_role).filter(user_role.c.role_id == role_id)).scalar()
+
+
+def _add(db: Session, role: RoleSchema.Create) -> Role:
     db_role = Role(**role.dict())
     db.add(db_role)
-    db.commit()
-    db.refresh(db_role)
+    VersionService.bump(db, VersionService.ROLE)
+    return db_role
+
 
+def create(db: Session, role: RoleSchema.Create) -> Role:
+    if write_queue.enabled():
+        # committed together with the writes of other requests
+        db_role = write_queue.run_sync(lambda writer_db: _add(writer_db, role))
+    else:
+        db_role = _add(db, role)
+        db.commit()
+        db.refresh(db_role)
+    CacheService.roles.invalidate(db_role.public_id)
+    MembershipService.index.add_role(db_role.id, db_role.name, db_role.public_id)
     return db_role
 
 
 def add_role_to_user(db: Session, db_role: Role, db_user: User) -> User:
-    db_user.roles.append(db_role)
+    if db_role not in db_user.roles:
+        db_user.roles.append(db_role)
     db.add(db_user)
+    VersionService.bump(db, VersionService.USER)
+    version = VersionService.bump_and_get(db, VersionService.MEMBERSHIP)
     db.commit()
     db.refresh(db_user)
+    CacheService.users.invalidate(db_user.public_id)
+    CacheService.roles.invalidate(db_role.public_id)
+    MembershipService.index.add(db_role.id, [db_user.id], version)
     return db_user
+
+
+def _commit(db: Session, operation: Callable[[Session], Any]) -> Any:
+    # through the write queue if enabled, otherwise in the session of the request
+    if write_queue.enabled():
+        return write_queue.run_sync(operation)
+    result = operation(db)
+    db.commit()
+    return result
+
+
+def add_role_to_users(db: Session, role_id: int, users: Dict[str, int]) -> int:
+    # users: public_id -> id. One INSERT ... SELECT for all the users, pairs that already exist are skipped
+    def operation(session: Session) -> Tuple[int, int]:
+        assigned = select(user_role.c.user_id).filter(user_role.c.role_id == role_id)
+        pairs = select(User.id, literal(role_id)).filter(User.id.in_(list(users.values())), ~User.id.in_(assigned))
+        result = session.execute(user_role.insert().from_select(["user_id", "role_id"], pairs))
+        VersionService.bump(session, VersionService.USER)
+        return result.rowcount, VersionService.bump_and_get(session, VersionService.MEMBERSHIP)
+
+    changed, version = _commit(db, operation)
+    CacheService.users.invalidate(*users.keys())
+    MembershipService.index.add(role_id, users.values(), version)
+    return changed
+
+
+def remove_role_from_users(db: Session, role_id: int, users: Dict[str, int]) -> int:
+    # users: public_id -> id. One DELETE for all the users
+    def operation(session: Session) -> Tuple[int, int]:
+        result = session.execute(user_role.delete().where(user_role.c.role_id == role_id,
+                                                          user_role.c.user_id.in_(list(users.values()))))
+        VersionService.bump(session, VersionService.USER)
+        return result.rowcount, VersionService.bump_and_get(session, VersionService.MEMBERSHIP)
+
+    changed, version = _commit(db, operation)
+    CacheService.users.invalidate(*users.keys())
+    MembershipService.index.remove(role_id, users.values(), version)
+    return changed
@@ -0,0 +1,53 @@
+# Async versions of UserService, to be used with AsyncSessionLocal
+from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.schemas import UserSchema
+from app.db.models.User import User
+from app.services import CacheService, HashingService, VersionService
+from app.services.UserService import public_users_statement, user_roles_statement, to_public_dicts
+
+
+def _select_user():
+    # roles are always loaded eagerly, lazy loading is not possible in async mode
+    return select(User).options(selectinload(User.roles))
+
+
+async def get_by_id(db: AsyncSession, user_id: int) -> User:
+    result = await db.execute(_select_user().filter(User.id == user_id))
+    return result.scalars().first()
+
+
+async def get_by_public_id(db: AsyncSession, public_id: str) -> User:
+    result = await db.execute(_select_user().filter(User.public_id == public_id))
+    return result.scalars().first()
+
+
+async def get_by_email(db: AsyncSession, email: str) -> User:
+    result = await db.execute(_select_user().filter(User.email == email))
+    return result.scalars().first()
+
+
+async def get_all(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[User]:
+    result = await db.execute(_select_user().offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+async def get_all_public(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[dict]:
+    # see UserService.get_all_public
+    user_rows = (await db.execute(public_users_statement(skip, limit))).all()
+    role_rows = (await db.execute(user_roles_statement([u.id for u in user_rows]))).all() if user_rows else []
+    return to_public_dicts(user_rows, role_rows)
+
+
+async def create(db: AsyncSession, user: UserSchema.Create) -> User:
+    # hashing the password is CPU bound, it runs in the hashing process pool
+    hashed_password = await HashingService.hash_text(user.password)
+    db_user = User(password=None, hashed_password=hashed_password, **user.dict(exclude={"password"}))
+    db.add(db_user)
+    await db.execute(VersionService.bump_statement(VersionService.USER))
+    await db.commit()
+    CacheService.users.invalidate(db_user.public_id)
+    # reloads the user with its roles (a refresh can not load collections)
+    return await get_by_id(db, db_user.id)
@@ -1,7 +1,20 @@
-from typing import List
+import asyncio
+import json
+import uuid
+from typing import AsyncIterator, Dict, Generator, List, Optional, Set, Tuple
+from pydantic import ValidationError
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.common.util import chunks
+from app.core.config import settings
 from app.schemas import UserSchema
-from app.db.models.User import User
+from app.db.models.Role import Role
+from app.db import write_queue
+from app.db.models.User import User, user_role
+from app.db.search_index import is_indexed, like_filter, search_filter, user_search
+from app.services import CacheService, HashingService, VersionService
 
 
 def get_by_id(db: Session, user_id: int) -> User:
@@ -16,13 +29,248 @@ def get_by_email(db: Session, email: str) -> User:
     return db.query(User).filter(User.email == email).first()
 
 
+def replace_hashed_password(db: Session, user_id: int, old_hash: bytes, new_hash: bytes) -> bool:
+    # compare and set: a password changed in the meantime is not overwritten
+    result = db.execute(update(User).where(User.id == user_id, User.hashed_password == old_hash)
+                        .values(hashed_password=new_hash).execution_options(synchronize_session=False))
+    db.commit()
+    return result.rowcount == 1
+
+
+def get_ids_by_public_ids(db: Session, public_ids: List[str]) -> Dict[str, int]:
+    # resolves a group of public ids with one IN query per chunk: public_id -> id
+    ids = dict()
+    for chunk in chunks(public_ids, settings.BATCH_GET_CHUNK_SIZE):
+        rows = db.execute(select(User.public_id, User.id).filter(User.public_id.in_(chunk)))
+        ids.update((r.public_id, r.id) for r in rows)
+    return ids
+
+
+def get_cached_by_public_id(db: Session, public_id: str, version: int = None) -> Optional[CacheService.Entry]:
+    # read-through cache: (id, immutable public representation, user version). <version>: the entry must not be
+    # older than this version of the user table (i.e. the one of the ETag), otherwise it is reloaded
+    def load() -> Optional[CacheService.Entry]:
+        loaded_version = VersionService.get_versions(db, VersionService.USER)[VersionService.USER]
+        user_rows = db.execute(public_users_statement(limit=1).filter(User.public_id == public_id)).all()
+        if not user_rows:
+            return None
+        role_rows = db.execute(user_roles_statement([user_rows[0].id])).all()
+        return CacheService.Entry(user_rows[0].id, CacheService.freeze(to_public_dicts(user_rows, role_rows)[0]),
+                                  loaded_version)
+
+    # the version is read before the user: an entry is never older than its version
+    entry = CacheService.users.get_or_load(public_id, load)
+    if entry is not None and version is not None and entry.version < version:
+        # changed by another process since it was cached (changes of this process invalidate it)
+        CacheService.users.invalidate(public_id)
+        entry = CacheService.users.get_or_load(public_id, load)
+    return entry
+
+
+def get_public_by_public_id(db: Session, public_id: str, version: int = None) -> Optional[dict]:
+    entry = get_cached_by_public_id(db, public_id, version)
+    return entry.public if entry is not None else None
+
+
+def get_public_by_public_ids(db: Session, public_ids: List[str]) -> Tuple[List[dict], List[str]]:
+    # users in the order of <public_ids> and the public ids that do not exist
+    # two IN queries per chunk of BATCH_GET_CHUNK_SIZE ids (users, then their roles)
+    public_ids = list(dict.fromkeys(public_ids))
+    found = dict()
+    for chunk in chunks(public_ids, settings.BATCH_GET_CHUNK_SIZE):
+        user_rows = db.execute(select(User.id, User.public_id, User.email, User.first_name, User.last_name)
+                               .filter(User.public_id.in_(chunk))).all()
+        role_rows = db.execute(user_roles_statement([u.id for u in user_rows])).all() if user_rows else []
+        found.update((u["public_id"], u) for u in to_public_dicts(user_rows, role_rows))
+    return [found[p] for p in public_ids if p in found], [p for p in public_ids if p not in found]
+
+
 def get_all(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
     return db.query(User).offset(skip).limit(limit).all()
 
 
-def create(db: Session, user: UserSchema.Create) -> User:
-    db_user = User(**user.dict())
+def public_users_statement(skip: int = 0, limit: int = 100, after_id: int = None):
+    # light projection: only the columns needed to build the public representation
+    statement = select(User.id, User.public_id, User.email, User.first_name, User.last_name).order_by(User.id)
+    if after_id is not None:
+        # keyset pagination: seeks directly in the primary key index, no rows are skipped
+        return statement.filter(User.id > after_id).limit(limit)
+    return statement.offset(skip).limit(limit)
+
+
+def user_roles_statement(user_ids: List[int]):
+    # roles of a group of users in a single query over user_role
+    return select(user_role.c.user_id, Role.public_id, Role.name, Role.description) \
+        .join(Role, Role.id == user_role.c.role_id).filter(user_role.c.user_id.in_(user_ids))
+
+
+def to_public_dicts(user_rows: list, role_rows: list) -> List[dict]:
+    # same fields as User.to_dict (in the order of UserSchema.Public), built from rows instead of ORM instances
+    roles_by_user: Dict[int, List[dict]] = dict()
+    for r in role_rows:
+        roles_by_user.setdefault(r.user_id, []).append(
+            dict(public_id=r.public_id, name=r.name, description=r.description))
+    return [dict(email=u.email, first_name=u.first_name, last_name=u.last_name, public_id=u.public_id,
+                 roles=roles_by_user.get(u.id, [])) for u in user_rows]
+
+
+def get_all_public(db: Session, skip: int = 0, limit: int = 100, versions: Dict[str, int] = None) -> List[dict]:
+    # two queries regardless of the page size (no lazy loading of User.roles). <versions>: the versions of the
+    # ETag of the response (see app.core.conditional_get), read here if not given
+    def load() -> List[dict]:
+        user_rows = db.execute(public_users_statement(skip, limit)).all()
+        role_rows = db.execute(user_roles_statement([u.id for u in user_rows])).all() if user_rows else []
+        return to_public_dicts(user_rows, role_rows)
+
+    # concurrent requests of the same page share one execution if they read the same versions: a load started
+    # before a change is never served under the ETag of that change
+    if versions is None:
+        versions = VersionService.get_versions(db, VersionService.USER)
+    return CacheService.reads.do(("users", skip, limit, tuple(versions.items())), load)
+
+
+def get_page_public(db: Session, after_id: int = 0, limit: int = 100) -> Tuple[List[dict], Optional[int]]:
+    # returns the page after <after_id> and the id to continue from (None if this is the last page)
+    limit = max(limit, 1)
+    user_rows = db.execute(public_users_statement(limit=limit + 1, after_id=after_id)).all()
+    next_id = user_rows[limit - 1].id if len(user_rows) > limit else None
+    user_rows = user_rows[:limit]
+    role_rows = db.execute(user_roles_statement([u.id for u in user_rows])).all() if user_rows else []
+    return to_public_dicts(user_rows, role_rows), next_id
+
+
+def search_statement(q: str, limit: int = 20, indexed: bool = True):
+    # users containing <q> in email, first or last name, in the order of the search index
+    statement = select(User.id, User.public_id, User.email, User.first_name, User.last_name)
+    if not indexed:
+        return statement.filter(like_filter([User.email, User.first_name, User.last_name], q)) \
+            .order_by(User.id).limit(limit)
+    return statement.join(user_search, user_search.c.rowid == User.id) \
+        .filter(search_filter(user_search, ["email", "first_name", "last_name"], q)) \
+        .order_by(user_search.c.rowid).limit(limit)
+
+
+def search_public(db: Session, q: str, limit: int = 20) -> List[dict]:
+    user_rows = db.execute(search_statement(q, limit, is_indexed(db.bind))).all()
+    role_rows = db.execute(user_roles_statement([u.id for u in user_rows])).all() if user_rows else []
+    return to_public_dicts(user_rows, role_rows)
+
+
+def iter_all_public(db: Session, batch_size: int = 1000) -> Generator[List[dict], None, None]:
+    # walks the whole table in keyset batches, only one batch is kept in memory
+    after_id = 0
+    while after_id is not None:
+        users, after_id = get_page_public(db, after_id=after_id, limit=batch_size)
+        if users:
+            yield users
+
+
+async def create(db: Session, user: UserSchema.Create) -> User:
+    # the password is hashed in the hashing process pool, the session is used from the thread pool
+    hashed_password = await HashingService.hash_text(user.password)
+    if write_queue.enabled():
+        # committed together with the writes of other requests
+        db_user = await write_queue.run(lambda writer_db: _add(writer_db, user, hashed_password))
+        CacheService.users.invalidate(db_user.public_id)
+        return db_user
+    return await run_in_threadpool(_insert, db, user, hashed_password)
+
+
+def _add(db: Session, user: UserSchema.Create, hashed_password: bytes) -> User:
+    # a new user has no roles (roles=[]: the collection is loaded, to_dict does not need the session)
+    db_user = User(password=None, hashed_password=hashed_password, roles=[], **user.dict(exclude={"password"}))
     db.add(db_user)
+    VersionService.bump(db, VersionService.USER)
+    return db_user
+
+
+def _insert(db: Session, user: UserSchema.Create, hashed_password: bytes) -> User:
+    db_user = _add(db, user, hashed_password)
     db.commit()
     db.refresh(db_user)
+    CacheService.users.invalidate(db_user.public_id)
     return db_user
+
+
+def get_existing_emails(db: Session, emails: List[str]) -> Set[str]:
+    # set based check: one query for the whole group of emails
+    return {r.email for r in db.execute(select(User.email).filter(User.email.in_(emails)))}
+
+
+def _insert_many(db: Session, rows: List[dict]):
+    # executemany in a single transaction
+    try:
+        db.execute(User.__table__.insert(), rows)
+        VersionService.bump(db, VersionService.USER)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise
+    # new users are not cached, but list reads started before the insert must not be shared after it
+    CacheService.users.invalidate()
+
+
+async def bulk_create(db: Session, records: AsyncIterator[Tuple[Optional[dict], Optional[str]]],
+                      chunk_size: int = 500) -> List[dict]:
+    # creates users from a stream of (record, error), chunk by chunk, returns a result per row
+    results, chunk = [], []
+    async for record, error in records:
+        chunk.append((len(results) + len(chunk) + 1, record, error))
+        if len(chunk) >= chunk_size:
+            results.extend(await _create_chunk(db, chunk))
+            chunk = []
+    if chunk:
+        results.extend(await _create_chunk(db, chunk))
+    return results
+
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+def _echoed_email(record: Optional[dict]) -> Optional[str]:
+    # the email of an invalid row, as sent: any JSON value, reported as text
+    email = record.get("email") if record else None
+    if email is None or isinstance(email, str):
+        return email
+    return json.dumps(email)
+
+
+async def _create_chunk(db: Session, chunk: List[Tuple[int, Optional[dict], Optional[str]]]) -> List[dict]:
+    results: Dict[int, dict] = dict()
+    valid: List[Tuple[int, UserSchema.Create]] = []
+    for row, record, error in chunk:
+        if error is None:
+            try:
+                valid.append((row, UserSchema.Create(**record)))
+            except ValidationError as e:
+                error = _validation_message(e)
+        if error is not None:
+            results[row] = dict(row=row, email=_echoed_email(record), status="invalid", error=error)
+
+    existing = await run_in_threadpool(get_existing_emails, db, [u.email for _, u in valid]) if valid else set()
+    new: List[Tuple[int, UserSchema.Create]] = []
+    for row, user in valid:
+        if user.email in existing:
+            results[row] = dict(row=row, email=user.email, status="duplicate", error="Email already registered.")
+        else:
+            # duplicates inside the same chunk
+            existing.add(user.email)
+            new.append((row, user))
+
+    # passwords are hashed in parallel by the hashing process pool
+    hashed_passwords = await asyncio.gather(*[HashingService.hash_text(u.password) for _, u in new])
+    rows = [dict(public_id=str(uuid.uuid4()), email=u.email, first_name=u.first_name, last_name=u.last_name,
+                 hashed_password=hashed_password, is_active=True)
+            for (_, u), hashed_password in zip(new, hashed_passwords)]
+    try:
+        if rows:
+            await run_in_threadpool(_insert_many, db, rows)
+        for (row, user), values in zip(new, rows):
+            results[row] = dict(row=row, email=user.email, status="created", public_id=values["public_id"])
+    except IntegrityError:
+        # a concurrent request inserted one of these emails after the check, nothing of this chunk was inserted
+        for row, user in new:
+            results[row] = dict(row=row, email=user.email, status="failed",
+                                error="Conflict with a concurrent insert, nothing was inserted for this row.")
+    return [results[row] for row, _, _ in chunk]
@@ -0,0 +1,70 @@
+# Change counters per table ("user", "role"), used to build the ETags of the read endpoints
+import hashlib
+from typing import Dict
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.models.EntityVersion import EntityVersion
+
+USER = "user"
+ROLE = "role"
+# user -> role assignments, also counted in USER (see MembershipService)
+MEMBERSHIP = "user_role"
+
+
+def bump_statement(name: str):
+    # upsert: the counter row is created with the first change
+    statement = insert(EntityVersion).values(name=name, version=1)
+    return statement.on_conflict_do_update(index_elements=[EntityVersion.name],
+                                           set_=dict(version=EntityVersion.version + 1))
+
+
+def bump(db: Session, *names: str):
+    # must be executed before the commit of the change, so both are in the same transaction
+    for name in names:
+        db.execute(bump_statement(name))
+
+
+def versions_statement(*names: str):
+    # single primary key lookup, no ORM instances
+    return select(EntityVersion.name, EntityVersion.version).filter(EntityVersion.name.in_(names))
+
+
+def to_versions(rows, names) -> Dict[str, int]:
+    versions = {r.name: r.version for r in rows}
+    return {name: versions.get(name, 0) for name in names}
+
+
+def get_versions(db: Session, *names: str) -> Dict[str, int]:
+    return to_versions(db.execute(versions_statement(*names)), names)
+
+
+def bump_and_get(db: Session, name: str) -> int:
+    # new version of <name>: read in the transaction of the change, no other writer can bump it in between
+    bump(db, name)
+    return get_versions(db, name)[name]
+
+
+async def get_versions_async(db: AsyncSession, *names: str) -> Dict[str, int]:
+    return to_versions(await db.execute(versions_statement(*names)), names)
+
+
+def etag(db: Session, resource: str, *names: str) -> str:
+    # strong ETag of <resource> (path and query) for the current versions of the tables <names>
+    return etag_of(resource, get_versions(db, *names))
+
+
+def etag_of(resource: str, versions: Dict[str, int]) -> str:
+    key = f"{resource}|" + "|".join(f"{k}={v}" for k, v in sorted(versions.items()))
+    return '"' + hashlib.blake2b(key.encode("utf8"), digest_size=12).hexdigest() + '"'
+
+
+def is_not_modified(if_none_match: str, current_etag: str) -> bool:
+    # If-None-Match: "*" or a list of (strong or weak) ETags
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any((t[2:] if t.startswith("W/") else t) == current_etag for t in tags)
@@ -0,0 +1,100 @@
+"""
+Read latency during a write storm, with and without admission control (ADMISSION_CONTROL): <writers> concurrent
+clients keep sending role membership changes (POST/DELETE /role/{public_role_id}/users) or POST /user/
+(bcrypt + commit) while <readers> clients send GET /user/{public_id} and
+GET /roles/. With admission control, writes over the limits of their route class get 503 + Retry-After (the
+writers wait that time and send again) and the read p99 must stay bounded.
+Usage: python -m benchmarks.bench_admission [--storm roles|users] [--writers 100] [--reads 2000] [--readers 10]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+from benchmarks.bench_async_db import seed
+from benchmarks.common import run_isolated, run_load, summarize, temporary_database_url
+
+
+async def write_storm(app, writers: int, stop: asyncio.Event, next_write) -> dict:
+    # next_write(i) from <writers> clients until <stop>, rejected clients wait Retry-After
+    import httpx
+
+    latencies, rejected, errors, counter = [], 0, 0, itertools.count()
+    # unhandled errors are received as 500 responses (counted as errors), like a real client would
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def writer():
+            nonlocal rejected, errors
+            while not stop.is_set():
+                i = next(counter)
+                start = time.perf_counter()
+                method, url, body = next_write(i)
+                response = await client.request(method, url, json=body)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code == 503:
+                    rejected += 1
+                    await asyncio.sleep(float(response.headers["retry-after"]))
+                elif response.status_code >= 400:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*[writer() for _ in range(writers)])
+        return dict(summarize(latencies, time.perf_counter() - start, errors), rejected=rejected)
+
+
+async def storm(args) -> dict:
+    from app.main import api
+    from app.schemas import RoleSchema
+    from app.db.session import SessionLocal
+    from app.services import RoleService
+
+    public_ids = seed(1000)
+    with SessionLocal() as db:
+        role_id = RoleService.create(db, RoleSchema.Create(name="storm", description="storm")).public_id
+
+    def write(i):
+        if args.storm == "users":
+            return "POST", "/user/", dict(email=f"storm{i}@bench.com", first_name="Storm", last_name=f"User{i}",
+                                          password=f"password{i}")
+        # sync handler: holds a worker thread and the database write lock
+        method = "POST" if i % 2 == 0 else "DELETE"
+        return method, f"/role/{role_id}/users", [public_ids[(i * 50 + j) % len(public_ids)] for j in range(50)]
+
+    def read(i):
+        return ("GET", "/roles/", None) if i % 5 == 0 else ("GET", f"/user/{public_ids[i % len(public_ids)]}", None)
+
+    baseline = await run_load(api, read, args.reads // 4, args.readers)
+    stop = asyncio.Event()
+    writes = asyncio.ensure_future(write_storm(api, args.writers, stop, write))
+    # the storm is running before the reads start
+    await asyncio.sleep(1)
+    reads = await run_load(api, read, args.reads, args.readers)
+    stop.set()
+    return dict(reads_alone=baseline, reads_during_storm=reads, writes=await writes)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=100)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--readers", type=int, default=10)
+    parser.add_argument("--storm", choices=["roles", "users"], default="roles",
+                        help="roles: role membership writes, users: user creation (bcrypt)")
+    parser.add_argument("--worker", action="store_true", help="internal: runs one measurement")
+    args = parser.parse_args()
+    if args.worker:
+        print(json.dumps(asyncio.run(storm(args))))
+        return
+
+    params = ["--worker", "--storm", args.storm, "--writers", str(args.writers), "--reads", str(args.reads),
+              "--readers", str(args.readers)]
+    results = dict()
+    for mode, enabled in (("without_admission_control", "false"), ("with_admission_control", "true")):
+        env = dict(ADMISSION_CONTROL=enabled, SQLALCHEMY_DATABASE_URL=temporary_database_url())
+        results[mode] = run_isolated("benchmarks.bench_admission", env, *params)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
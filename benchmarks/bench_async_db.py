@@ -0,0 +1,62 @@
+"""
+Compares requests/sec and p99 latency of the sync database path (thread pool + SessionLocal) against the
+async database path (ASYNC_DB=true, aiosqlite).
+Usage: python -m benchmarks.bench_async_db [--users 1000] [--requests 5000] [--concurrency 100]
+"""
+import argparse
+import asyncio
+import json
+import uuid
+
+from benchmarks.common import run_isolated, run_load, temporary_database_url
+
+
+def seed(n_users: int) -> list:
+    from app.common.util import get_hashed_text
+    from app.db.models.User import User
+    from app.db.session import engine
+
+    # the hash is computed once: seeding must not be dominated by bcrypt
+    hashed_password = get_hashed_text("benchmark")
+    rows = [dict(public_id=str(uuid.uuid4()), email=f"user{i}@bench.com", first_name=f"First{i}",
+                 last_name=f"Last{i}", hashed_password=hashed_password, is_active=True) for i in range(n_users)]
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), rows)
+    return [r["public_id"] for r in rows]
+
+
+def worker(args):
+    from app.main import api
+
+    public_ids = seed(args.users)
+
+    def next_request(i):
+        if i % 4 == 0:
+            return "GET", "/users/?limit=20", None
+        return "GET", f"/user/{public_ids[i % len(public_ids)]}", None
+
+    result = asyncio.run(run_load(api, next_request, args.requests, args.concurrency))
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--worker", action="store_true", help="internal: runs one measurement")
+    args = parser.parse_args()
+    if args.worker:
+        return worker(args)
+
+    params = ["--worker", "--users", str(args.users), "--requests", str(args.requests),
+              "--concurrency", str(args.concurrency)]
+    results = dict()
+    for mode, async_db in (("sync", "false"), ("async", "true")):
+        env = dict(ASYNC_DB=async_db, SQLALCHEMY_DATABASE_URL=temporary_database_url())
+        results[mode] = run_isolated("benchmarks.bench_async_db", env, *params)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
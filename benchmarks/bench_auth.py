@@ -0,0 +1,52 @@
+"""
+Cost of authenticating a request: validation of a token issued by POST /auth/login (signature check + cached
+revocation and user status, AuthService.authenticate) against a bcrypt password check per request.
+Usage: python -m benchmarks.bench_auth [--iterations 100000] [--rounds 12]
+"""
+import argparse
+import json
+import os
+import time
+
+from benchmarks.common import temporary_database_url
+
+
+def per_call_us(function, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return round((time.perf_counter() - start) / iterations * 1e6, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URL", temporary_database_url())
+
+    from app.common.util import get_hashed_text, verify_hashed_text
+    from app.db.init_db import init_db
+    from app.db.models.User import User
+    from app.db.session import SessionLocal
+    from app.services import AuthService
+
+    init_db()
+    hashed = get_hashed_text("password", args.rounds)
+    with SessionLocal() as db:
+        user = User(password=None, email="auth@bench.com", first_name="Auth", last_name="Bench",
+                    hashed_password=hashed)
+        db.add(user)
+        db.commit()
+        token = AuthService.issue_token(user.public_id)
+        AuthService.authenticate(db, token)
+        results = dict(
+            token_us=per_call_us(lambda: AuthService.authenticate(db, token), args.iterations),
+            bcrypt_us=per_call_us(lambda: verify_hashed_text("password", hashed), max(1, args.iterations // 10000)),
+            bcrypt_rounds=args.rounds)
+    results["speedup"] = round(results["bcrypt_us"] / results["token_us"])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
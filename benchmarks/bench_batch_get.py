@@ -0,0 +1,82 @@
+"""
+Batch lookups: resolving <ids> users (and all the roles) one GET at a time vs a single POST .../batch-get.
+The batch request must return the same users in the requested order, report the unknown ids in not_found and
+use two IN queries per BATCH_GET_CHUNK_SIZE ids (checked).
+Usage: python -m benchmarks.bench_batch_get [--users 20000] [--ids 500]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+
+from benchmarks.common import count_queries, temporary_database_url
+
+
+def seed(n_users: int, n_roles: int = 20):
+    import uuid
+    from app.db.models.Role import Role
+    from app.db.models.User import User, user_role
+    from app.db.session import engine
+
+    users = [dict(id=i + 1, public_id=str(uuid.uuid4()), email=f"user{i}@bench.com", first_name="Batch",
+                  last_name=f"User{i}", hashed_password="x", is_active=True) for i in range(n_users)]
+    roles = [dict(id=i + 1, public_id=str(uuid.uuid4()), name=f"Role{i}", description="batch", is_active=True)
+             for i in range(n_roles)]
+    pairs = [dict(user_id=u["id"], role_id=r) for u in users for r in range(1, 1 + u["id"] % 3)]
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), users)
+        conn.execute(Role.__table__.insert(), roles)
+        conn.execute(user_role.insert(), pairs)
+    return [u["public_id"] for u in users], [r["public_id"] for r in roles]
+
+
+async def timed(client, method: str, url: str, body=None):
+    start = time.perf_counter()
+    response = await client.request(method, url, json=body)
+    assert response.status_code == 200, response.text
+    return response.json(), (time.perf_counter() - start) * 1000
+
+
+async def main(n_users: int, n_ids: int):
+    import httpx
+    from app.core.config import settings
+    from app.db.session import engines
+    from app.main import api
+    from app.services import CacheService
+
+    user_ids, role_ids = seed(n_users)
+    wanted = user_ids[::max(n_users // n_ids, 1)][:n_ids]
+    missing = ["missing-1", "missing-2"]
+    results = dict()
+    transport = httpx.ASGITransport(app=api)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, ids, one_url, batch_url in (("users", wanted, "/user/{}", "/users/batch-get"),
+                                              ("roles", role_ids, "/role/{}", "/roles/batch-get")):
+            CacheService.users.clear()
+            CacheService.roles.clear()
+            with count_queries(*engines) as counter:
+                start = time.perf_counter()
+                singles = [(await timed(client, "GET", one_url.format(i)))[0] for i in ids]
+                elapsed = (time.perf_counter() - start) * 1000
+            results[f"GET {one_url} x{len(ids)}"] = dict(ms=round(elapsed, 1), queries=counter["queries"])
+            with count_queries(*engines) as counter:
+                batch, elapsed = await timed(client, "POST", batch_url, missing[:1] + ids + missing[1:])
+            results[f"POST {batch_url} x{len(ids)}"] = dict(ms=round(elapsed, 1), queries=counter["queries"])
+            assert [item["public_id"] for item in batch["items"]] == ids
+            assert batch["not_found"] == missing
+            assert batch["items"] == singles
+            per_chunk = 2 if name == "users" else 1
+            chunks = math.ceil((len(ids) + len(missing)) / settings.BATCH_GET_CHUNK_SIZE)
+            assert counter["queries"] <= per_chunk * chunks + 1, f"{name}: {counter['queries']} queries"
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--ids", type=int, default=500)
+    args = parser.parse_args()
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URL", temporary_database_url())
+    asyncio.run(main(args.users, args.ids))
@@ -0,0 +1,69 @@
+"""
+Bulk import (POST /users/bulk, NDJSON) against a loop of single creates (POST /user/).
+bcrypt runs with PASSWORD_HASH_ROUNDS=4 and the floor lowered to it (unless given) so the comparison measures the request/database path.
+Usage: python -m benchmarks.bench_bulk_import [--rows 10000,100000] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import run_isolated, run_load, temporary_database_url
+
+
+def user(i: int) -> dict:
+    return dict(email=f"user{i}@bench.com", first_name=f"First{i}", last_name=f"Last{i}", password=f"password{i}")
+
+
+def worker(args):
+    from app.main import api
+    from app.services import HashingService
+
+    if args.mode == "loop":
+        result = asyncio.run(run_load(api, lambda i: ("POST", "/user/", user(i)), args.rows, args.concurrency))
+    else:
+        import httpx
+
+        async def bulk():
+            body = "".join(json.dumps(user(i)) + "\n" for i in range(args.rows)).encode("utf8")
+            transport = httpx.ASGITransport(app=api)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                start = time.perf_counter()
+                response = await client.post("/users/bulk", content=body,
+                                              headers={"content-type": "application/x-ndjson"})
+                elapsed = time.perf_counter() - start
+            report = response.json()
+            return dict(requests=1, rows=args.rows, created=report["created"], failed=report["failed"],
+                        elapsed_s=round(elapsed, 4), rows_per_s=round(args.rows / elapsed, 2))
+
+        result = asyncio.run(bulk())
+    HashingService.shutdown()
+    if "rps" in result:
+        result["rows_per_s"] = result["rps"]
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="10000,100000", help="comma separated list of sizes")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients of the single-create loop")
+    parser.add_argument("--rounds", default="4", help="bcrypt cost factor used in the benchmark")
+    parser.add_argument("--mode", choices=["loop", "bulk"], help="internal: runs one measurement")
+    parser.add_argument("--worker", action="store_true", help="internal: runs one measurement")
+    args = parser.parse_args()
+    if args.worker:
+        args.rows = int(args.rows)
+        return worker(args)
+
+    results = dict()
+    for rows in args.rows.split(","):
+        for mode in ("loop", "bulk"):
+            env = dict(SQLALCHEMY_DATABASE_URL=temporary_database_url(), PASSWORD_HASH_ROUNDS=args.rounds,
+                       PASSWORD_HASH_MIN_ROUNDS=args.rounds)
+            results[f"{mode}_{rows}"] = run_isolated("benchmarks.bench_bulk_import", env, "--worker", "--mode", mode,
+                                                     "--rows", rows, "--concurrency", str(args.concurrency))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
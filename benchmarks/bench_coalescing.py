@@ -0,0 +1,63 @@
+"""
+Request coalescing: <clients> concurrent identical GET /roles/ and GET /user/{public_id} requests, the database
+is slowed down (<delay-ms> per statement) so all the requests overlap. With COALESCE_READS the role list and the
+user lookup must be executed once (checked), without it once per request.
+Usage: python -m benchmarks.bench_coalescing [--clients 30] [--delay-ms 200]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+
+from benchmarks.bench_serialization import seed
+from benchmarks.common import run_load, temporary_database_url
+
+
+def slow_statements(engines, delay: float, counter: dict):
+    # counts and delays the statements reading the role and user tables
+    from sqlalchemy import event
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        for table in ("role", "user"):
+            if statement.lstrip().upper().startswith("SELECT") and re.search(rf"FROM {table}\b", statement):
+                counter[table] += 1
+                time.sleep(delay)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def main(clients: int, delay: float):
+    from app.core.config import settings
+    from app.db.session import engines
+    from app.main import api
+    from app.services import CacheService
+
+    public_id = seed(100)
+    counter = dict(role=0, user=0)
+    slow_statements(engines, delay, counter)
+    results = dict()
+    for coalesce in (False, True):
+        settings.COALESCE_READS = coalesce
+        mode = "coalesced" if coalesce else "independent"
+        for table, url in (("role", "/roles/"), ("user", f"/user/{public_id}")):
+            CacheService.users.clear()
+            counter[table] = 0
+            load = await run_load(api, lambda i: ("GET", url, None), clients, clients)
+            results[f"{mode} GET {url.split('/')[1]}"] = dict(queries=counter[table], p50_ms=load["p50_ms"],
+                                                               errors=load["errors"])
+            if coalesce:
+                assert counter[table] == 1, f"{url}: {counter[table]} executions for {clients} concurrent requests"
+    results["coalescing"] = CacheService.coalescing_stats()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=30)
+    parser.add_argument("--delay-ms", type=float, default=200)
+    args = parser.parse_args()
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URL", temporary_database_url())
+    asyncio.run(main(args.clients, args.delay_ms / 1000))
@@ -0,0 +1,80 @@
+"""
+Mixed read/write throughput of the session setups (see app.db.session):
+    single_engine: one engine, default pooling and no pragmas (previous setup)
+    single_engine_tuned: one engine with the SQLite write profile of the environment file
+    routed: DB_READ_WRITE_ROUTING, read pool + single write connection, with the read/write profiles
+    routed_small_pool: routed with a read pool smaller than the concurrency (<concurrency> / 4 connections kept,
+        the overflow covers the rest): requests above the pool size must not wait for connections held by sessions
+        not yet closed (no errors, checked)
+Reads: GET /user/{public_id}, /users/page, /users/search, /roles/. Writes: role membership changes.
+Admission control is disabled: the database path itself is measured.
+Usage: python -m benchmarks.bench_db_routing [--users 10000] [--requests 4000] [--concurrency 100] [--writes 20]
+"""
+import argparse
+import asyncio
+import json
+
+from benchmarks.bench_async_db import seed
+from benchmarks.common import run_isolated, run_load, temporary_database_url
+
+
+async def mixed_load(args) -> dict:
+    from app.db.session import SessionLocal
+    from app.main import api
+    from app.schemas import RoleSchema
+    from app.services import RoleService
+
+    public_ids = seed(args.users)
+    with SessionLocal() as db:
+        role_id = RoleService.create(db, RoleSchema.Create(name="mixed", description="mixed")).public_id
+
+    def next_request(i):
+        if i % 100 < args.writes:
+            method = "POST" if i % 2 == 0 else "DELETE"
+            return method, f"/role/{role_id}/users", [public_ids[(i * 20 + j) % len(public_ids)] for j in range(20)]
+        kind = i % 4
+        if kind == 0:
+            return "GET", f"/user/{public_ids[(i * 7) % len(public_ids)]}", None
+        if kind == 1:
+            return "GET", "/users/page?limit=50", None
+        if kind == 2:
+            return "GET", f"/users/search?q=user{i % 1000}", None
+        return "GET", "/roles/", None
+
+    return await run_load(api, next_request, args.requests, args.concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--writes", type=int, default=20, help="percentage of write requests")
+    parser.add_argument("--worker", action="store_true", help="internal: runs one measurement")
+    args = parser.parse_args()
+    if args.worker:
+        print(json.dumps(asyncio.run(mixed_load(args))))
+        return
+
+    params = ["--worker", "--users", str(args.users), "--requests", str(args.requests),
+              "--concurrency", str(args.concurrency), "--writes", str(args.writes)]
+    small_pool = max(args.concurrency // 4, 1)
+    modes = dict(
+        single_engine=dict(DB_READ_WRITE_ROUTING="false", SQLITE_WRITE_PRAGMAS="", SQLITE_READ_PRAGMAS=""),
+        # profiles of the environment file (dev.env, or prod.env with ENV=prod)
+        single_engine_tuned=dict(DB_READ_WRITE_ROUTING="false"),
+        routed=dict(DB_READ_WRITE_ROUTING="true"),
+        routed_small_pool=dict(DB_READ_WRITE_ROUTING="true", DB_READ_POOL_SIZE=str(small_pool),
+                               DB_READ_POOL_MAX_OVERFLOW=str(args.concurrency - small_pool)),
+    )
+    results = dict()
+    for mode, env in modes.items():
+        env = dict(env, ADMISSION_CONTROL="false", SQLALCHEMY_DATABASE_URL=temporary_database_url())
+        results[mode] = run_isolated("benchmarks.bench_db_routing", env, *params)
+        if mode.startswith("routed"):
+            assert results[mode]["errors"] == 0, f"{mode}: {results[mode]['errors']} failed requests"
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Conditional GET: server CPU time of clients polling GET /users/, GET /roles/ and GET /user/{public_id}
+without If-None-Match (full query + serialization each time) against clients sending the last ETag received.
+Every <write-every> polls a role is assigned to a user, so part of the polls see new data (realistic poll mix).
+Usage: python -m benchmarks.bench_etag [--polls 3000] [--write-every 50] [--concurrency 10]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.bench_serialization import seed
+from benchmarks.common import temporary_database_url
+
+
+async def poll(client, urls, polls: int, write_every: int, concurrency: int, conditional: bool, public_id: str):
+    etags = dict()
+    counters = dict(not_modified=0, ok=0)
+    order = iter(range(polls))
+
+    async def worker(n: int):
+        for i in order:
+            if i % write_every == write_every - 1:
+                role = (await client.post("/role/", json=dict(name=f"bench-{conditional}-{i}", description="")))
+                await client.post(f"/role/{role.json()['public_id']}/user/{public_id}")
+            url = urls[i % len(urls)]
+            headers = {"If-None-Match": etags[(n, url)]} if conditional and (n, url) in etags else None
+            response = await client.get(url, headers=headers)
+            counters["not_modified" if response.status_code == 304 else "ok"] += 1
+            etags[(n, url)] = response.headers.get("etag")
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.gather(*[worker(n) for n in range(concurrency)])
+    return dict(cpu_s=round(time.process_time() - cpu, 3), wall_s=round(time.perf_counter() - wall, 3), **counters)
+
+
+async def main(polls: int, write_every: int, concurrency: int):
+    import httpx
+    from app.main import api
+
+    public_id = seed(1000)
+    urls = ["/users/?limit=100", "/roles/", f"/user/{public_id}"]
+    transport = httpx.ASGITransport(app=api)
+    results = dict()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for conditional in (False, True):
+            results["if_none_match" if conditional else "unconditional"] = \
+                await poll(client, urls, polls, write_every, concurrency, conditional, public_id)
+    results["cpu_saved_pct"] = round(
+        100 * (1 - results["if_none_match"]["cpu_s"] / results["unconditional"]["cpu_s"]), 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--polls", type=int, default=3000)
+    parser.add_argument("--write-every", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URL", temporary_database_url())
+    asyncio.run(main(args.polls, args.write_every, args.concurrency))
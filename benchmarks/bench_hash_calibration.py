@@ -0,0 +1,53 @@
+"""
+bcrypt cost calibration (HashingService.calibrate, PASSWORD_HASH_ROUNDS=0): for each latency target, the chosen cost
+and the measured time of a hash with it. The hash must fit the target (with some noise) and a cost one round higher
+must not, unless the floor PASSWORD_HASH_MIN_ROUNDS applies (checked).
+Usage: python -m benchmarks.bench_hash_calibration [--targets 25,50,100,250,500] [--floor 8] [--samples 3]
+"""
+import argparse
+import json
+import time
+
+
+def measure(rounds: int, samples: int) -> float:
+    from app.common.util import get_hashed_text
+
+    elapsed = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        get_hashed_text("password", rounds)
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--targets", default="25,50,100,250,500", help="latency targets (ms)")
+    parser.add_argument("--floor", type=int, default=8, help="PASSWORD_HASH_MIN_ROUNDS (lowered to see the calibration)")
+    parser.add_argument("--samples", type=int, default=3)
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    from app.services import HashingService
+
+    settings.PASSWORD_HASH_ROUNDS = 0
+    settings.PASSWORD_HASH_MIN_ROUNDS = args.floor
+    results = dict(floor_rounds=settings.PASSWORD_HASH_MIN_ROUNDS)
+    for target in [float(t) for t in args.targets.split(",")]:
+        settings.PASSWORD_HASH_TARGET_MS = target
+        start = time.perf_counter()
+        calibration = HashingService.calibrate()
+        calibration_ms = (time.perf_counter() - start) * 1000
+        rounds = calibration["rounds"]
+        hash_ms = measure(rounds, args.samples)
+        results[f"target {target:g} ms"] = dict(rounds=rounds, hash_ms=round(hash_ms, 1),
+                                               expected_hash_ms=calibration["expected_hash_ms"],
+                                               calibration_ms=round(calibration_ms, 1))
+        if rounds > settings.PASSWORD_HASH_MIN_ROUNDS:
+            assert hash_ms <= target * 1.25, f"target {target} ms: cost {rounds} takes {hash_ms:.1f} ms"
+        assert hash_ms * 2 > target * 0.75, f"target {target} ms: cost {rounds + 1} would still fit"
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
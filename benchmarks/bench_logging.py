@@ -0,0 +1,70 @@
+"""
+Event loop stall time while logging: synchronous RotatingFileHandler + StreamHandler (previous configuration)
+against the queued pipeline of configure_logger.
+Every logging call blocks the event loop while it runs: the time spent in each call is measured
+(rotation and flushes of the synchronous handlers show up in the max/p99 values).
+Usage: python -m benchmarks.bench_logging [--records 20000] [--tasks 50] > /dev/null
+(results are written to stderr, the loggers write to stdout)
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from logging import StreamHandler
+from logging.handlers import RotatingFileHandler
+
+from benchmarks.common import percentile
+
+
+def synchronous_logger(folder: str) -> logging.Logger:
+    # configuration previous to the queued pipeline
+    logger = logging.getLogger("bench_sync.log")
+    formatter = logging.Formatter('%(levelname)s - [%(asctime)s] - %(message)s')
+    r_handler = RotatingFileHandler(os.path.join(folder, "bench_sync.log"), maxBytes=500000, backupCount=5)
+    r_handler.setFormatter(formatter)
+    logger.addHandler(r_handler)
+    logger.addHandler(StreamHandler(sys.stdout))
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+async def measure(logger: logging.Logger, records: int, tasks: int) -> dict:
+    stalls = []
+
+    async def request(n: int):
+        for i in range(n):
+            start = time.perf_counter()
+            logger.info(f"127.0.0.1: GET http://localhost/users/?skip={i} [200] 1.0 ms, 2 queries")
+            stalls.append(time.perf_counter() - start)
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[request(records // tasks) for _ in range(tasks)])
+    elapsed = time.perf_counter() - start
+    return dict(records=records, elapsed_s=round(elapsed, 4), total_stall_ms=round(sum(stalls) * 1000, 3),
+                max_stall_ms=round(max(stalls) * 1000, 3), p99_stall_ms=round(percentile(stalls, 99) * 1000, 3))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--tasks", type=int, default=50)
+    args = parser.parse_args()
+
+    from app.common import DefaultLogger
+
+    folder = tempfile.mkdtemp(prefix="bench_logs_")
+    DefaultLogger.log_path = folder
+    results = dict(
+        synchronous=asyncio.run(measure(synchronous_logger(folder), args.records, args.tasks)),
+        queued=asyncio.run(measure(DefaultLogger.configure_logger("bench_queued.log"), args.records, args.tasks)),
+    )
+    sys.stderr.write(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
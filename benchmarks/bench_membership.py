@@ -0,0 +1,89 @@
+"""
+Permission checks: MembershipService.has_role (in-memory bitset per role) against a primary key lookup on user_role
+(MEMBERSHIP_INDEX=false) and the ORM walk of User.roles (one relationship load per check), with <users> users
+holding 0-2 of <roles> roles. The answers of the index must match the database (checked on the sample).
+Usage: python -m benchmarks.bench_membership [--users 1000000] [--roles 20] [--checks 1000000] [--sample 2000]
+"""
+import argparse
+import json
+import os
+import random
+import time
+import uuid
+
+from benchmarks.common import temporary_database_url
+
+
+def seed(n_users: int, n_roles: int, batch: int = 50000) -> float:
+    from app.db.models.Role import Role
+    from app.db.models.User import User, user_role
+    from app.db.session import engine
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(Role.__table__.insert(), [dict(id=r + 1, public_id=str(uuid.uuid4()), name=f"Role{r}",
+                                                    description="bench", is_active=True) for r in range(n_roles)])
+    for offset in range(0, n_users, batch):
+        ids = range(offset + 1, min(n_users, offset + batch) + 1)
+        users = [dict(id=i, public_id=str(uuid.uuid4()), email=f"user{i}@bench.com", first_name="Check",
+                      last_name=f"User{i}", hashed_password="x", is_active=True) for i in ids]
+        pairs = [dict(user_id=i, role_id=(i * 7 + k) % n_roles + 1) for i in ids for k in range(i % 3)]
+        with engine.begin() as conn:
+            conn.execute(User.__table__.insert(), users)
+            conn.execute(user_role.insert(), pairs)
+    return time.perf_counter() - start
+
+
+def per_check_us(check, pairs) -> float:
+    start = time.perf_counter()
+    for user_id, role_id in pairs:
+        check(user_id, role_id)
+    return round((time.perf_counter() - start) / len(pairs) * 1e6, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--roles", type=int, default=20)
+    parser.add_argument("--checks", type=int, default=1000000)
+    parser.add_argument("--sample", type=int, default=2000)
+    args = parser.parse_args()
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URL", temporary_database_url())
+
+    from app.core.config import settings
+    from app.db.init_db import init_db
+    from app.db.models.Role import Role
+    from app.db.models.User import User
+    from app.db.session import SessionLocal
+    from app.services import MembershipService
+
+    init_db()
+    results = dict(users=args.users, roles=args.roles, seed_s=round(seed(args.users, args.roles), 1))
+    rnd = random.Random(0)
+    pairs = [(rnd.randint(1, args.users), rnd.randint(1, args.roles)) for _ in range(args.checks)]
+    sample = pairs[:args.sample]
+    with SessionLocal() as db:
+        MembershipService.index.build(db)
+        results["index"] = MembershipService.stats()
+        results["index_us"] = per_check_us(lambda u, r: MembershipService.has_role(db, u, r), pairs)
+        expected = [MembershipService.has_role(db, u, r) for u, r in sample]
+
+        settings.MEMBERSHIP_INDEX = False
+        results["primary_key_lookup_us"] = per_check_us(lambda u, r: MembershipService.has_role(db, u, r), sample)
+        assert [MembershipService.has_role(db, u, r) for u, r in sample] == expected
+
+        roles = {r.id: r for r in db.query(Role)}
+
+        def orm_walk(user_id: int, role_id: int) -> bool:
+            user = db.get(User, user_id)
+            found = roles[role_id] in user.roles
+            db.expire(user)
+            return found
+
+        results["orm_walk_us"] = per_check_us(orm_walk, sample)
+        assert [orm_walk(u, r) for u, r in sample] == expected
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Substring search on users: FTS5 trigram index (UserService.search_statement, used by GET /users/search) against
+a LIKE '%q%' scan of the user table, for selective, frequent, short and missing terms.
+The index is maintained by triggers, the seeding time includes their cost.
+Usage: python -m benchmarks.bench_search [--users 1000000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import time
+import uuid
+
+from benchmarks.common import temporary_database_url
+
+FIRST_NAMES = ["Ana", "Bruno", "Carla", "Diego", "Elena", "Fabián", "Gabriela", "Hugo", "Inés", "Jorge", "Karina",
+               "Luis", "María", "Nicolás", "Olga", "Pablo", "Rosa", "Santiago", "Teresa", "Víctor"]
+LAST_NAMES = ["Andrade", "Benítez", "Cárdenas", "Espinoza", "Guerrero", "Herrera", "Jaramillo", "López", "Mora",
+              "Naranjo", "Ortiz", "Paredes", "Quiroga", "Ramírez", "Salazar", "Torres", "Vásquez", "Zambrano"]
+
+
+def seed(n_users: int, batch: int = 50000) -> float:
+    from app.db.models.User import User
+    from app.db.session import engine
+
+    rnd = random.Random(0)
+    start = time.perf_counter()
+    for offset in range(0, n_users, batch):
+        rows = []
+        for i in range(offset, min(n_users, offset + batch)):
+            first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+            rows.append(dict(id=i + 1, public_id=str(uuid.uuid4()), email=f"{first.lower()}.{last.lower()}{i}@bench.com",
+                             first_name=first, last_name=last, hashed_password="x", is_active=True))
+        with engine.begin() as conn:
+            conn.execute(User.__table__.insert(), rows)
+    return time.perf_counter() - start
+
+
+def timed(conn, statement, repeat: int) -> dict:
+    rows, elapsed = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(statement).all()
+        elapsed.append(time.perf_counter() - start)
+    return dict(rows=len(rows), ms=round(min(elapsed) * 1000, 3))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URL", temporary_database_url())
+
+    from sqlalchemy import select
+    from app.db.init_db import init_db
+    from app.db.models.User import User
+    from app.db.search_index import like_filter
+    from app.db.session import engine
+    from app.services import UserService
+
+    init_db()
+    results = dict(users=args.users, seed_s=round(seed(args.users), 1))
+    terms = dict(selective=f"{args.users // 2}@", frequent="herrera", short="ma", missing="xyzzy")
+    columns = [User.email, User.first_name, User.last_name]
+    with engine.connect() as conn:
+        for kind, q in terms.items():
+            index = UserService.search_statement(q, args.limit)
+            scan = select(User.id, User.public_id, User.email, User.first_name, User.last_name) \
+                .filter(like_filter(columns, q)).order_by(User.id).limit(args.limit)
+            results[f"{kind} ({q})"] = dict(fts5=timed(conn, index, args.repeat), like=timed(conn, scan, args.repeat))
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {UserService.search_statement('herrera').compile(engine)}",
+                            ("\"herrera\"", args.limit, 0)).all()
+    results["fts5_plan"] = [row[-1] for row in plan]
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
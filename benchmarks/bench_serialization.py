@@ -0,0 +1,73 @@
+"""
+Response serialization of the list endpoints: response_model validation + standard JSON encoding against
+FAST_SERIALIZATION (direct encoding of the query rows, orjson if available).
+Before measuring, the responses of both modes are compared byte by byte (contract check).
+Usage: python -m benchmarks.bench_serialization [--iterations 200]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from benchmarks.common import percentile, temporary_database_url
+
+
+def seed(n_users: int, n_roles: int = 5):
+    from app.db.models.Role import Role
+    from app.db.models.User import User, user_role
+    from app.db.session import engine
+
+    # non ASCII values and quotes: the encoders must produce the same bytes
+    users = [dict(id=i + 1, public_id=str(uuid.uuid4()), email=f"user{i}@bench.com", first_name=f"José \"{i}\"",
+                  last_name=f"Nuñez-{i}", hashed_password="x", is_active=True) for i in range(n_users)]
+    roles = [dict(id=i + 1, public_id=str(uuid.uuid4()), name=f"Rôle{i}", description=f"Role {i} ✓", is_active=True)
+             for i in range(n_roles)]
+    pairs = [dict(user_id=u["id"], role_id=r) for u in users for r in range(1, 1 + u["id"] % 3)]
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), users)
+        conn.execute(Role.__table__.insert(), roles)
+        conn.execute(user_role.insert(), pairs)
+    return users[0]["public_id"]
+
+
+async def main(iterations: int):
+    import httpx
+    from app.core.config import settings
+    from app.main import api
+
+    public_id = seed(1000)
+    urls = [f"/users/?limit={n}" for n in (100, 1000)] + ["/users/page?limit=100", "/roles/", f"/user/{public_id}"]
+    results = dict()
+    transport = httpx.ASGITransport(app=api)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # contract check
+        for url in urls:
+            settings.FAST_SERIALIZATION = False
+            standard = (await client.get(url)).content
+            settings.FAST_SERIALIZATION = True
+            fast = (await client.get(url)).content
+            assert standard == fast, f"{url}: responses are different"
+
+        for n in (100, 1000):
+            url = f"/users/?limit={n}"
+            for mode in (False, True):
+                settings.FAST_SERIALIZATION = mode
+                latencies = []
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    await client.get(url)
+                    latencies.append(time.perf_counter() - start)
+                results[f"users_{n}_{'fast' if mode else 'standard'}"] = dict(
+                    mean_ms=round(sum(latencies) / len(latencies) * 1000, 3),
+                    p99_ms=round(percentile(latencies, 99) * 1000, 3))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URL", temporary_database_url())
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,64 @@
+"""
+Query count and latency of the users list: ORM instances + User.to_dict (lazy loading of roles)
+against the projection used by GET /users/ (UserService.get_all_public).
+Usage: python -m benchmarks.bench_users_list [--users 2000] [--roles 10]
+"""
+import argparse
+import json
+import os
+import time
+
+from benchmarks.common import count_queries, temporary_database_url
+
+
+def seed(n_users: int, n_roles: int):
+    import uuid
+    from app.db.models.Role import Role
+    from app.db.models.User import User, user_role
+    from app.db.session import engine
+
+    users = [dict(id=i + 1, public_id=str(uuid.uuid4()), email=f"user{i}@bench.com", first_name=f"First{i}",
+                  last_name=f"Last{i}", hashed_password="x", is_active=True) for i in range(n_users)]
+    roles = [dict(id=i + 1, public_id=str(uuid.uuid4()), name=f"Role{i}", description=f"Role {i}", is_active=True)
+             for i in range(n_roles)]
+    pairs = [dict(user_id=u["id"], role_id=(u["id"] + k) % n_roles + 1) for u in users for k in range(2)]
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), users)
+        conn.execute(Role.__table__.insert(), roles)
+        conn.execute(user_role.insert(), pairs)
+
+
+def measure(engines, function) -> dict:
+    with count_queries(*engines) as counter:
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+    return dict(queries=counter["queries"], ms=round(elapsed * 1000, 3))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--roles", type=int, default=10)
+    args = parser.parse_args()
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URL", temporary_database_url())
+
+    from app.db.base import DBBaseClass
+    from app.db.session import SessionLocal, engine, engines
+    from app.services import UserService
+
+    DBBaseClass.metadata.create_all(bind=engine)
+    seed(args.users, args.roles)
+    results = dict()
+    for limit in (10, 100, 1000):
+        with SessionLocal() as db:
+            orm = measure(engines, lambda: [u.to_dict() for u in UserService.get_all(db, limit=limit)])
+        with SessionLocal() as db:
+            projection = measure(engines, lambda: UserService.get_all_public(db, limit=limit))
+        results[f"limit_{limit}"] = dict(orm_to_dict=orm, projection=projection)
+    print(json.dumps(results, indent=2))
+    assert len({r["projection"]["queries"] for r in results.values()}) == 1, "query count depends on the page size"
+
+
+if __name__ == "__main__":
+    main()
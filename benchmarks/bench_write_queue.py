@@ -0,0 +1,66 @@
+"""
+Group commit stress test: <creators> concurrent clients create <roles> roles (POST /role/) and <users> users
+(POST /user/, low bcrypt cost) with per-request commits and with WRITE_QUEUE. With WRITE_QUEUE, checks that every
+request succeeded and that every row is in the database. Reports the throughput, errors and rows of both modes.
+Admission control is disabled: the write path itself is measured.
+Usage: python -m benchmarks.bench_write_queue [--creators 300] [--roles 2000] [--users 1000]
+"""
+import argparse
+import asyncio
+import json
+import uuid
+
+from benchmarks.common import run_isolated, run_load, temporary_database_url
+
+
+async def create_all(args) -> dict:
+    from sqlalchemy import func, select
+    from app.db import write_queue
+    from app.db.models.Role import Role
+    from app.db.models.User import User
+    from app.db.session import engine
+    from app.main import api
+
+    run_id = uuid.uuid4().hex[:8]
+    results = dict(
+        roles=await run_load(api, lambda i: ("POST", "/role/", dict(name=f"Role{run_id}_{i}", description="")),
+                             args.roles, args.creators),
+        users=await run_load(api, lambda i: ("POST", "/user/", dict(email=f"user{run_id}_{i}@bench.com",
+                                                                    first_name="Write", last_name=f"Queue{i}",
+                                                                    password="password")),
+                             args.users, args.creators))
+    with engine.connect() as conn:
+        rows = dict(roles=conn.execute(select(func.count(Role.id))).scalar(),
+                    users=conn.execute(select(func.count(User.id))).scalar())
+    for kind in ("roles", "users"):
+        results[kind]["rows"] = rows[kind]
+        if write_queue.enabled():
+            assert results[kind]["errors"] == 0 and rows[kind] == getattr(args, kind), \
+                f"{kind}: {results[kind]['errors']} errors, {rows[kind]} rows in the database"
+    results["write_queue"] = write_queue.stats()
+    write_queue.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--creators", type=int, default=300)
+    parser.add_argument("--roles", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--worker", action="store_true", help="internal: runs one measurement")
+    args = parser.parse_args()
+    if args.worker:
+        print(json.dumps(asyncio.run(create_all(args))))
+        return
+
+    params = ["--worker", "--creators", str(args.creators), "--roles", str(args.roles), "--users", str(args.users)]
+    results = dict()
+    for mode, enabled in (("per_request_commit", "false"), ("group_commit", "true")):
+        env = dict(WRITE_QUEUE=enabled, ADMISSION_CONTROL="false", PASSWORD_HASH_ROUNDS="4", PASSWORD_HASH_MIN_ROUNDS="4",
+                   SQLALCHEMY_DATABASE_URL=temporary_database_url())
+        results[mode] = run_isolated("benchmarks.bench_write_queue", env, *params)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
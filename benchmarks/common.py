@@ -0,0 +1,108 @@
+"""
+Shared helpers for the benchmarks: in-process ASGI load generation and latency statistics.
+Benchmarks are executed from the project root, i.e.: python -m benchmarks.bench_async_db
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# a request is described as (method, url, body) or (method, url, body, headers)
+# body: dict/list is sent as JSON, str/bytes as it is
+RequestSpec = Tuple
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> Dict[str, float]:
+    return dict(
+        requests=len(latencies),
+        errors=errors,
+        elapsed_s=round(elapsed, 4),
+        rps=round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        p50_ms=round(percentile(latencies, 50) * 1000, 3),
+        p95_ms=round(percentile(latencies, 95) * 1000, 3),
+        p99_ms=round(percentile(latencies, 99) * 1000, 3),
+    )
+
+
+async def run_load(app, next_request: Callable[[int], RequestSpec], total: int, concurrency: int) -> Dict[str, float]:
+    """
+    Sends <total> requests to the ASGI <app> in-process, keeping <concurrency> requests in flight.
+    next_request(i) gives the request to send as i-th request.
+    """
+    import httpx
+
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+    # unhandled errors are received as 500 responses (counted as errors), like a real client would
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                method, url, body, *headers = next_request(i)
+                content, json_body = (body, None) if isinstance(body, (str, bytes)) else (None, body)
+                start = time.perf_counter()
+                response = await client.request(method, url, content=content, json=json_body,
+                                                headers=headers[0] if headers else None)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, elapsed, errors)
+
+
+@contextmanager
+def count_queries(*engines):
+    """ Counts the statements sent to the database through <engines> while the context is open """
+    from sqlalchemy import event
+
+    counter = dict(queries=0)
+
+    def before_cursor_execute(*args):
+        counter["queries"] += 1
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def temporary_database_url() -> str:
+    folder = tempfile.mkdtemp(prefix="bench_")
+    return "sqlite:///" + os.path.join(folder, "bench.db")
+
+
+def run_isolated(module: str, env: Dict[str, str], *args: str) -> dict:
+    """
+    Runs a benchmark module in a new interpreter (settings are read at import time), the module must
+    print its results as a JSON document in the last line of its output
+    """
+    process_env = dict(os.environ)
+    process_env.update(env)
+    process = subprocess.run([sys.executable, "-m", module, *args], cwd=project_path, env=process_env,
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"{module} failed with {env}:\n{process.stderr[-3000:]}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
@@ -0,0 +1,198 @@
+"""
+In-process load test of every route of UserEndpoint and RoleEndpoint (ASGI, no external service).
+
+The database is seeded through the app.db.models tables with <users> users, <roles> roles and a realistic user_role
+fan-out (0 to 6 roles per user, 2 on average). Each route is loaded with <concurrency> clients and the results
+(throughput, p50/p95/p99 latency, errors and statements per request) are written as JSON, so runs of different
+commits can be compared.
+
+Usage:
+    python -m benchmarks.load_suite --users 10000 [--concurrency 50] [--requests 500] [--output result.json]
+    python -m benchmarks.load_suite --users 1000000 --database /tmp/bench_1m.db   (the database is kept and reused)
+bcrypt runs with PASSWORD_HASH_ROUNDS=4 (and PASSWORD_HASH_MIN_ROUNDS=4) unless it is given in the environment.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+import uuid
+from typing import Dict, List
+
+from benchmarks.common import count_queries, project_path, run_load, temporary_database_url
+
+# roles per user and their weights: 2 roles on average
+ROLE_FAN_OUT = ([0, 1, 2, 3, 4, 6], [10, 30, 30, 15, 10, 5])
+SEED_BATCH = 50000
+SAMPLE_SIZE = 10000
+
+
+def seed(n_users: int, n_roles: int, seed_value: int = 42):
+    from app.common.util import get_hashed_text
+    from app.db.models.Role import Role
+    from app.db.models.User import User, user_role
+    from app.db.session import engine
+
+    rnd = random.Random(seed_value)
+    hashed_password = get_hashed_text("benchmark", 4)
+    roles = [dict(id=i + 1, public_id=str(uuid.uuid4()), name=f"Role{i}", description=f"Seeded role {i}",
+                  is_active=True) for i in range(n_roles)]
+    with engine.begin() as conn:
+        conn.execute(Role.__table__.insert(), roles)
+        for start in range(0, n_users, SEED_BATCH):
+            users, pairs = [], []
+            for user_id in range(start + 1, min(start + SEED_BATCH, n_users) + 1):
+                users.append(dict(id=user_id, public_id=str(uuid.uuid4()), email=f"user{user_id}@bench.com",
+                                  first_name=f"First{user_id}", last_name=f"Last{user_id}",
+                                  hashed_password=hashed_password, is_active=True))
+                fan_out = rnd.choices(*ROLE_FAN_OUT)[0]
+                pairs += [dict(user_id=user_id, role_id=role_id)
+                          for role_id in rnd.sample(range(1, n_roles + 1), min(fan_out, n_roles))]
+            conn.execute(User.__table__.insert(), users)
+            if pairs:
+                conn.execute(user_role.insert(), pairs)
+
+
+def load_samples() -> dict:
+    # ids used to build the requests
+    from sqlalchemy import func, select
+    from app.db.models.Role import Role
+    from app.db.models.User import User
+    from app.db.session import engine
+
+    with engine.connect() as conn:
+        n_users = conn.execute(select(func.count(User.id))).scalar()
+        step = max(1, n_users // SAMPLE_SIZE)
+        users = conn.execute(select(User.id, User.public_id).filter(User.id % step == 0).limit(SAMPLE_SIZE)).all()
+        roles = conn.execute(select(Role.id, Role.public_id)).all()
+    return dict(n_users=n_users, user_ids=[u.id for u in users], user_public_ids=[u.public_id for u in users],
+                role_public_ids=[r.public_id for r in roles])
+
+
+def scenarios(samples: dict, run_id: str) -> Dict[str, tuple]:
+    """
+    "METHOD route" -> (next_request(i), share of the number of requests)
+    every route of UserEndpoint and RoleEndpoint must have a scenario (see check_coverage)
+    """
+    from app.common.util import encode_cursor
+
+    users, roles = samples["user_public_ids"], samples["role_public_ids"]
+    user_ids = samples["user_ids"]
+
+    def new_user(i: int, prefix: str = "") -> dict:
+        return dict(email=f"{prefix}load{run_id}_{i}@bench.com", first_name="Load", last_name=f"User{i}",
+                    password=f"password{i}")
+
+    def pick(values: List[str], i: int, k: int = 20) -> List[str]:
+        return [values[(i * k + j) % len(values)] for j in range(k)]
+
+    return {
+        "POST /user/": (lambda i: ("POST", "/user/", new_user(i)), 0.2),
+        "POST /users/bulk": (lambda i: ("POST", "/users/bulk", "".join(
+            json.dumps(new_user(i * 100 + j, "bulk")) + "\n" for j in range(100))), 0.05),
+        "POST /users/batch-get": (lambda i: ("POST", "/users/batch-get", pick(users, i, 100)), 0.5),
+        "GET /users/": (lambda i: ("GET", f"/users/?skip={(i * 97) % 1000}&limit=100", None), 1),
+        "GET /users/page": (lambda i: ("GET", f"/users/page?limit=100&cursor="
+                                              f"{encode_cursor(user_ids[i % len(user_ids)])}", None), 1),
+        "GET /users/search": (lambda i: ("GET", f"/users/search?q=user{i % 100}", None), 0.5),
+        "GET /users/export": (lambda i: ("GET", "/users/export", None), 0.002),
+        "GET /user/{public_id}/roles/{role}": (
+            lambda i: ("GET", f"/user/{users[i % len(users)]}/roles/{roles[i % len(roles)]}", None), 1),
+        "GET /user/{public_id}": (lambda i: ("GET", f"/user/{users[i % len(users)]}", None), 1),
+        "POST /role/": (lambda i: ("POST", "/role/", dict(name=f"Load{run_id}_{i}", description="load test")), 0.2),
+        "POST /roles/batch-get": (lambda i: ("POST", "/roles/batch-get", pick(roles, i, 10)), 0.5),
+        "GET /roles/": (lambda i: ("GET", "/roles/", None), 1),
+        "GET /roles/page": (lambda i: ("GET", "/roles/page?limit=10", None), 1),
+        "GET /roles/search": (lambda i: ("GET", "/roles/search?q=load", None), 0.5),
+        "GET /roles/export": (lambda i: ("GET", "/roles/export", None), 0.2),
+        "GET /role/{public_id}": (lambda i: ("GET", f"/role/{roles[i % len(roles)]}", None), 1),
+        "POST /role/{public_role_id}/user/{public_user_id}": (
+            lambda i: ("POST", f"/role/{roles[i % len(roles)]}/user/{users[(i * 7) % len(users)]}", None), 0.5),
+        "GET /role/{public_role_id}/users": (
+            lambda i: ("GET", f"/role/{roles[i % len(roles)]}/users?limit=100", None), 0.5),
+        "GET /role/{public_role_id}/users/count": (
+            lambda i: ("GET", f"/role/{roles[i % len(roles)]}/users/count", None), 0.5),
+        "POST /role/{public_role_id}/users": (
+            lambda i: ("POST", f"/role/{roles[i % len(roles)]}/users", pick(users, i)), 0.2),
+        "DELETE /role/{public_role_id}/users": (
+            lambda i: ("DELETE", f"/role/{roles[i % len(roles)]}/users", pick(users, i)), 0.2),
+    }
+
+
+def check_coverage(defined: Dict[str, tuple]):
+    from app.endpoints import RoleEndpoint, UserEndpoint
+
+    routes = {f"{method} {route.path}" for router in (UserEndpoint.router, RoleEndpoint.router)
+              for route in router.routes for method in route.methods}
+    missing = routes - set(defined)
+    if missing:
+        raise RuntimeError(f"Routes without load scenario: {sorted(missing)}")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=project_path, capture_output=True,
+                              text=True).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+async def run(args) -> dict:
+    from app.db.session import engines
+    from app.main import api
+    from app.services import HashingService
+
+    samples = load_samples()
+    defined = scenarios(samples, run_id=uuid.uuid4().hex[:8])
+    check_coverage(defined)
+    routes = dict()
+    for name, (next_request, share) in defined.items():
+        if args.routes and name not in args.routes:
+            continue
+        total = max(1, int(args.requests * share))
+        with count_queries(*engines) as counter:
+            result = await run_load(api, next_request, total, min(args.concurrency, total))
+        result["queries_per_request"] = round(counter["queries"] / total, 2)
+        routes[name] = result
+    HashingService.shutdown()
+    return dict(commit=git_commit(), time=time.strftime("%Y-%m-%dT%H:%M:%S"), users=samples["n_users"],
+                roles=len(samples["role_public_ids"]), concurrency=args.concurrency, requests=args.requests,
+                routes=routes)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000, help="i.e. 10000, 100000, 1000000")
+    parser.add_argument("--roles", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500, help="requests per route (scaled by route)")
+    parser.add_argument("--routes", nargs="*", help="only these routes, i.e. 'GET /users/'")
+    parser.add_argument("--database", help="SQLite file, seeded only if it does not exist")
+    parser.add_argument("--output", help="JSON file for the results (also printed)")
+    args = parser.parse_args()
+
+    database = args.database or temporary_database_url()[len("sqlite:///"):]
+    must_seed = not os.path.exists(database)
+    os.environ["SQLALCHEMY_DATABASE_URL"] = "sqlite:///" + database
+    os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")
+    os.environ.setdefault("PASSWORD_HASH_MIN_ROUNDS", os.environ["PASSWORD_HASH_ROUNDS"])
+
+    from app.db.init_db import init_db
+    init_db()
+    if must_seed:
+        start = time.perf_counter()
+        seed(args.users, args.roles)
+        print(f"Seeded {args.users} users in {time.perf_counter() - start:.1f} s")
+
+    results = asyncio.run(run(args))
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,155 @@
+import atexit
+import json
 import logging
 import os
+import queue
 import sys
-from logging import StreamHandler
-from logging.handlers import RotatingFileHandler
+import threading
+from logging.handlers import QueueHandler, RotatingFileHandler
+from typing import Dict, List
+
 from app import project_path
 
 log_path = os.path.join(project_path, "log")
 
 # Logger configuration:
 rotating_file_handler = {"maxBytes": 500000, "backupCount": 5, "mode": "a"}
+# records written (and flushed) together by the writer thread
+batch_size = 200
+
+
+class JsonLinesFormatter(logging.Formatter):
+    # one JSON document per record
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(dict(time=self.formatTime(record), level=record.levelname, logger=record.name,
+                               message=record.getMessage()))
+
+
+class BatchRotatingFileHandler(RotatingFileHandler):
+    # writes a group of records and flushes once, instead of flushing after each record
+
+    def write_batch(self, records: List[logging.LogRecord]):
+        self.acquire()
+        try:
+            for record in records:
+                if self.shouldRollover(record):
+                    self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write(self.format(record) + self.terminator)
+            self.stream.flush()
+        except Exception:
+            self.handleError(records[-1])
+        finally:
+            self.release()
+
+
+class QueuedFileWriter(threading.Thread):
+    """
+    Background thread that owns the handlers of one log file: loggers only put records in its queue, file and
+    stdout writes, flushes and rotation happen in this thread (off the request path).
+    The thread is started (and the log folder created) with the first record
+    """
+
+    def __init__(self, log_file_name: str, formatter: logging.Formatter):
+        super().__init__(name=f"log-writer-{os.path.basename(log_file_name)}", daemon=True)
+        self.queue = queue.SimpleQueue()
+        self.file_handler = BatchRotatingFileHandler(log_file_name, delay=True, **rotating_file_handler)
+        self.set_formatter(formatter)
+        self._start_lock = threading.Lock()
+        self.running = False
+
+    def ensure_started(self):
+        if self.running:
+            return
+        with self._start_lock:
+            if not self.running:
+                os.makedirs(os.path.dirname(self.file_handler.baseFilename), exist_ok=True)
+                self.start()
+                self.running = True
+
+    def set_formatter(self, formatter: logging.Formatter):
+        self.formatter = formatter
+        self.file_handler.setFormatter(formatter)
 
+    def run(self):
+        stop = False
+        while not stop:
+            records = [self.queue.get()]
+            while len(records) < batch_size:
+                try:
+                    records.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            # None is the signal to stop
+            stop = None in records
+            records = [r for r in records if r is not None]
+            if records:
+                self.file_handler.write_batch(records)
+                try:
+                    sys.stdout.write("".join(self.formatter.format(r) + "\n" for r in records))
+                    sys.stdout.flush()
+                except Exception:
+                    pass
+        self.file_handler.close()
 
-def configure_logger(log_name: str = None, with_time: bool = True, level: logging = logging.INFO) -> logging.Logger:
+    def stop(self, timeout: float = 5.0):
+        if self.running:
+            self.queue.put(None)
+            self.join(timeout)
+
+
+class LazyQueueHandler(QueueHandler):
+    # starts the writer of the queue with the first record
+    def __init__(self, writer: QueuedFileWriter):
+        super().__init__(writer.queue)
+        self.writer = writer
+
+    def enqueue(self, record: logging.LogRecord):
+        self.writer.ensure_started()
+        super().enqueue(record)
+
+
+# log file name -> writer
+_writers: Dict[str, QueuedFileWriter] = dict()
+_writers_lock = threading.Lock()
+
+
+@atexit.register
+def stop_writers():
+    # pending records are written before the interpreter exits
+    with _writers_lock:
+        for writer in _writers.values():
+            writer.stop()
+        _writers.clear()
+
+
+def configure_logger(log_name: str = None, with_time: bool = True, level: logging = logging.INFO,
+                     json_lines: bool = False) -> logging.Logger:
 
     if log_name is None:
         log_name = "Default.log"
-    if not os.path.exists(log_path):
-        os.makedirs(log_path)
 
     log_file_name = os.path.join(log_path, log_name)
-    rotating_file_handler["filename"] = log_file_name
     logger = logging.getLogger(log_name)
-    if with_time:
+    if json_lines:
+        formatter = JsonLinesFormatter()
+    elif with_time:
         formatter = logging.Formatter('%(levelname)s - [%(asctime)s] - %(message)s')
     else:
         formatter = logging.Formatter('%(levelname)s - %(message)s')
 
-    # creating rotating and stream Handler
-    r_handler = RotatingFileHandler(**rotating_file_handler)
-    r_handler.setFormatter(formatter)
-    s_handler = StreamHandler(sys.stdout)
-    # adding handlers:
-    logger.addHandler(r_handler)
-    logger.addHandler(s_handler)
+    # one writer per file, configuring the same logger again only updates its format and level
+    with _writers_lock:
+        writer = _writers.get(log_file_name)
+        if writer is None:
+            writer = _writers[log_file_name] = QueuedFileWriter(log_file_name, formatter)
+        else:
+            writer.set_formatter(formatter)
+
+    if not any(isinstance(h, QueueHandler) and h.queue is writer.queue for h in logger.handlers):
+        logger.addHandler(LazyQueueHandler(writer))
 
     # setting logger in class
     logger.setLevel(level)
     return logger
-
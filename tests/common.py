@@ -0,0 +1,54 @@
+"""
+Shared helpers for the tests (the environment of the tests is set in conftest.py)
+"""
+import re
+import uuid
+from contextlib import contextmanager
+from typing import Callable
+
+
+def insert_users(n: int, invalidate: bool = True, **values) -> list:
+    # <n> users with a fake password hash (no bcrypt), returns their public ids. Without <invalidate> the caches
+    # of this process are not told, like for an insert of another process
+    from app.db.models.User import User
+    from app.db.session import engine
+    from app.services import CacheService, VersionService
+
+    rows = [dict(dict(public_id=str(uuid.uuid4()), email=f"{uuid.uuid4().hex}@tests.com", first_name="Test",
+                      last_name="User", hashed_password="x", is_active=True), **values) for _ in range(n)]
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), rows)
+        conn.execute(VersionService.bump_statement(VersionService.USER))
+    if invalidate:
+        CacheService.users.invalidate()
+    return [r["public_id"] for r in rows]
+
+
+async def send_concurrently(app, requests: list) -> list:
+    # sends the (method, url) or (method, url, json body) <requests> to the ASGI <app> at the same time, returns
+    # the responses in order
+    import asyncio
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://tests") as client:
+        return await asyncio.gather(*[client.request(method, url, json=body[0] if body else None)
+                                      for method, url, *body in requests])
+
+
+@contextmanager
+def on_statement(engines, pattern: str, action: Callable[[str], None]):
+    # calls action(statement) before each SELECT matching the regex <pattern> while the context is open
+    from sqlalchemy import event
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT") and re.search(pattern, statement):
+            action(statement)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
@@ -0,0 +1,36 @@
+"""
+Tests of the application, executed in-process against a temporary SQLite database.
+Tests are executed from the project root, i.e.: python -m pytest tests
+"""
+import os
+import tempfile
+
+import pytest
+
+# settings are read when the application is imported: a new database and the cheapest bcrypt cost
+os.environ["SQLALCHEMY_DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="tests_"), "tests.db")
+os.environ["PASSWORD_HASH_ROUNDS"] = "4"
+os.environ["PASSWORD_HASH_MIN_ROUNDS"] = "4"
+
+
+@pytest.fixture(scope="session")
+def api():
+    from app.main import api
+
+    return api
+
+
+@pytest.fixture
+def client(api):
+    # without the context manager: the startup/shutdown events (hashing pool, write queue) are not triggered
+    from fastapi.testclient import TestClient
+
+    return TestClient(api)
+
+
+@pytest.fixture
+def db(api):
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as session:
+        yield session
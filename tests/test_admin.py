@@ -0,0 +1,24 @@
+import pytest
+
+from tests.common import insert_users
+
+
+@pytest.mark.parametrize("method, url", [("GET", "/admin/slow-queries"), ("DELETE", "/admin/slow-queries"),
+                                         ("GET", "/admin/errors"), ("GET", "/admin/startup")])
+def test_admin_routes_require_a_token_without_auth_required(client, method, url):
+    from app.core.config import settings
+
+    assert not settings.AUTH_REQUIRED
+    assert client.request(method, url).status_code == 401
+    assert client.request(method, url, headers=dict(Authorization="Bearer forged")).status_code == 401
+
+
+def test_admin_routes_with_a_token(client):
+    from app.common.util import get_hashed_text
+
+    insert_users(1, email="admin@tests.com", hashed_password=get_hashed_text("admin-password", 4))
+    login = client.post("/auth/login", json=dict(email="admin@tests.com", password="admin-password"))
+    assert login.status_code == 200, login.text
+    headers = dict(Authorization=f"Bearer {login.json()['access_token']}")
+    assert client.get("/admin/errors", headers=headers).status_code == 200
+    assert client.delete("/admin/slow-queries", headers=headers).status_code == 200
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from app.core import admission_control
+from app.core.admission_control import RouteClass
+
+
+def late_failure(error):
+    # wait_for of the first waiter: the slot is handed over, but the waiter fails before it resumes
+    wait_for, calls = asyncio.wait_for, []
+
+    async def fake_wait_for(future, timeout):
+        calls.append(future)
+        if len(calls) > 1:
+            return await wait_for(future, timeout)
+        await future
+        raise error()
+
+    return fake_wait_for
+
+
+@pytest.mark.parametrize("error", [asyncio.TimeoutError, asyncio.CancelledError])
+def test_slot_handed_to_a_failing_waiter_is_not_lost(monkeypatch, error):
+    monkeypatch.setattr(admission_control.asyncio, "wait_for", late_failure(error))
+
+    async def scenario():
+        route_class = RouteClass("test", "GET", "^/$", (1, 4, 5.0))
+        assert await route_class.acquire() is None
+        failing = asyncio.ensure_future(route_class.acquire())
+        waiting = asyncio.ensure_future(route_class.acquire())
+        await asyncio.sleep(0)
+        route_class.release(0.01)
+        # the slot goes from the failing waiter to the next one
+        if error is asyncio.CancelledError:
+            with pytest.raises(asyncio.CancelledError):
+                await failing
+        else:
+            assert await failing is not None
+        assert await asyncio.wait_for(waiting, 1) is None
+        route_class.release(0.01)
+        assert route_class.running == 0 and not route_class.stats()["queued"]
+        # all the capacity is available again
+        assert await route_class.acquire() is None
+        assert route_class.running == 1
+
+    asyncio.run(scenario())
+
+
+def test_requests_over_the_limits_are_rejected():
+    async def scenario():
+        route_class = RouteClass("test", "GET", "^/$", (1, 1, 0.05))
+        assert await route_class.acquire() is None
+        queued = asyncio.ensure_future(route_class.acquire())
+        await asyncio.sleep(0)
+        # queue full
+        assert await route_class.acquire() is not None
+        # waited max_wait without a slot
+        assert await queued is not None
+        route_class.release(0.01)
+        assert route_class.running == 0
+        stats = route_class.stats()
+        assert (stats["admitted"], stats["rejected"], stats["timed_out"]) == (1, 1, 1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,26 @@
+import json
+import uuid
+
+
+def test_bulk_import_reports_malformed_rows(client):
+    # valid rows and malformed ones (non-string email, bad JSON, not an object, missing fields) in one request
+    emails = [f"{uuid.uuid4().hex}@tests.com" for _ in range(2)]
+    lines = [
+        json.dumps(dict(email=emails[0], first_name="Bulk", last_name="One", password="secret-1")),
+        json.dumps(dict(email=5, first_name="Bulk", last_name="Number", password="secret-2")),
+        json.dumps(dict(email={"nested": True}, first_name="Bulk", last_name="Object", password="secret-3")),
+        "{not json",
+        json.dumps(["a", "list"]),
+        json.dumps(dict(email=emails[1])),
+        json.dumps(dict(email=emails[0], first_name="Bulk", last_name="Again", password="secret-4")),
+    ]
+    response = client.post("/users/bulk", content="\n".join(lines))
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert [r["status"] for r in report["results"]] == \
+           ["created", "invalid", "invalid", "invalid", "invalid", "invalid", "duplicate"]
+    assert [r["row"] for r in report["results"]] == list(range(1, len(lines) + 1))
+    assert [r["email"] for r in report["results"]] == \
+           [emails[0], "5", '{"nested": true}', None, None, emails[1], emails[0]]
+    assert report["created"] == 1 and report["failed"] == 6
+    assert client.get(f"/user/{report['results'][0]['public_id']}").json()["email"] == emails[0]
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+
+from tests.common import insert_users, on_statement, send_concurrently
+
+
+def test_concurrent_identical_reads_share_one_execution(api):
+    from app.db.session import engines
+    from app.services import CacheService
+
+    executions = []
+
+    def slow(statement):
+        # all the requests arrive while the first one is reading
+        executions.append(statement)
+        time.sleep(0.2)
+
+    flights = CacheService.reads.executions
+    with on_statement(engines, r"FROM role\b", slow):
+        responses = asyncio.run(send_concurrently(api, [("GET", "/roles/")] * 10))
+    assert [r.status_code for r in responses] == [200] * 10
+    assert len({r.text for r in responses}) == 1 and len({r.headers["etag"] for r in responses}) == 1
+    assert len(executions) == 1
+    assert CacheService.reads.executions == flights + 1
+
+
+def test_read_after_a_change_does_not_join_an_older_load(api):
+    # a change committed by another process (no local cache invalidation) while a page load is in flight: a read
+    # started after the change gets the new ETag and must not share the body loaded before the change
+    from app.db.session import engines
+
+    insert_users(1)
+    loading, release = threading.Event(), threading.Event()
+
+    def block_first(statement):
+        # the first load already read the users, it waits before reading their roles
+        if not loading.is_set():
+            loading.set()
+            release.wait(10)
+
+    async def scenario():
+        first = asyncio.ensure_future(send_concurrently(api, [("GET", "/users/?limit=1000")]))
+        while not loading.is_set():
+            await asyncio.sleep(0.01)
+        new_user = insert_users(1, invalidate=False)[0]
+        second = asyncio.ensure_future(send_concurrently(api, [("GET", "/users/?limit=1000")]))
+        await asyncio.sleep(0.3)
+        release.set()
+        return new_user, (await first)[0], (await second)[0]
+
+    with on_statement(engines, r"\buser_role\b", block_first):
+        new_user, before, after = asyncio.run(scenario())
+    assert before.status_code == after.status_code == 200
+    assert before.headers["etag"] != after.headers["etag"]
+    assert new_user not in [u["public_id"] for u in before.json()]
+    assert new_user in [u["public_id"] for u in after.json()]
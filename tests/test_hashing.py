@@ -0,0 +1,51 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.common.util import get_hash_rounds
+
+
+@pytest.fixture
+def calibration(api, monkeypatch):
+    # PASSWORD_HASH_ROUNDS=0 with a low floor and target, the calibration of the other tests is kept
+    from app.core.config import settings
+    from app.services import HashingService
+
+    monkeypatch.setattr(settings, "PASSWORD_HASH_ROUNDS", 0)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_TARGET_MS", 20)
+    monkeypatch.setattr(HashingService, "_calibration", dict(HashingService._calibration, rounds=0, calibrated=0))
+    monkeypatch.setattr(HashingService, "_calibrating", None)
+    return HashingService
+
+
+def test_startup_does_not_calibrate():
+    code = "import app.main; from app.services import HashingService; print(HashingService._calibration['rounds'])"
+    # same environment as the tests (database), without a fixed cost
+    process = subprocess.run([sys.executable, "-c", code], env=dict(os.environ, PASSWORD_HASH_ROUNDS="0"),
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), capture_output=True,
+                             text=True)
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.strip().splitlines()[-1] == "0"
+
+
+def test_first_hashes_share_one_calibration_in_the_pool(calibration):
+    async def scenario():
+        return await asyncio.gather(*[calibration.hash_text("password") for _ in range(4)])
+
+    completed = calibration._stats["completed"]
+    hashes = asyncio.run(scenario())
+    assert calibration._calibration["calibrated"] == 1
+    assert {get_hash_rounds(h) for h in hashes} == {calibration._calibration["rounds"]}
+    # the calibration is one more task of the pool
+    assert calibration._stats["completed"] == completed + 5
+
+
+def test_set_password_uses_the_calibrated_cost(calibration):
+    from app.db.models.User import User
+
+    user = User(password="password", email="model@tests.com", first_name="Model", last_name="User")
+    assert get_hash_rounds(user.hashed_password) == calibration.rounds()
+    assert calibration._calibration["calibrated"] == 1
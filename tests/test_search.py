@@ -0,0 +1,51 @@
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import Session
+
+from tests.common import insert_users
+
+
+@pytest.fixture
+def users(api):
+    # the substrings searched below are not in the other test users (hex emails, "Test User")
+    suffix = uuid.uuid4().hex
+    return insert_users(1, email=f"a{suffix}@bq.example", last_name="Maqzé") + \
+        insert_users(1, email=f"b{suffix}@tests.com", first_name="Uqz")
+
+
+@pytest.mark.parametrize("q, matches", [("@bq", [0]), ("@b", [0]), ("aqz", [0]), ("qz", [0, 1]), ("QZ", [0, 1])])
+def test_short_and_long_queries_match_substrings(client, users, q, matches):
+    # queries of 3+ characters use the trigram index, shorter ones a LIKE scan: both match any substring
+    found = [u["public_id"] for u in client.get("/users/search", params=dict(q=q, limit=100)).json()]
+    assert [p for p in found if p in users] == [users[i] for i in matches]
+
+
+def test_search_without_index_scans_the_table(client, users, monkeypatch):
+    from app.db import search_index
+    from app.db.session import engine
+
+    indexed = client.get("/users/search", params=dict(q="qz")).json()
+    monkeypatch.setitem(search_index._indexed, str(engine.url), False)
+    assert client.get("/users/search", params=dict(q="qz")).json() == indexed
+
+
+def test_init_db_without_trigram_tokenizer(monkeypatch, tmp_path):
+    # SQLite < 3.34: no search indexes, the searches use the LIKE scan
+    from app.db import search_index
+    from app.db.init_db import init_db
+    from app.db.models.User import User
+    from app.services import UserService
+
+    monkeypatch.setattr(search_index, "trigram_supported", lambda conn: False)
+    bind = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    init_db(bind)
+    assert not inspect(bind).has_table("user_search")
+    assert not search_index.is_indexed(bind)
+    with bind.begin() as conn:
+        conn.execute(User.__table__.insert(), [dict(public_id="old-1", email="a@bq.example", first_name="Old",
+                                                     last_name="Maqzé", hashed_password="x", is_active=True)])
+    with Session(bind) as db:
+        assert [u["public_id"] for u in UserService.search_public(db, "aqz")] == ["old-1"]
+        assert [u["public_id"] for u in UserService.search_public(db, "@b")] == ["old-1"]
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from app.common import serialization
+from app.common.serialization import public_response
+from tests.common import insert_users
+
+
+class Event(BaseModel):
+    name: str
+    at: datetime
+    note: Optional[str] = None
+
+
+class Timeline(BaseModel):
+    events: List[Event]
+    next_cursor: Optional[str] = None
+
+
+def both_modes(monkeypatch, send) -> tuple:
+    # the response of send() with the response_model encoding and with FAST_SERIALIZATION
+    from app.core.config import settings
+
+    responses = []
+    for fast in (False, True):
+        monkeypatch.setattr(settings, "FAST_SERIALIZATION", fast)
+        responses.append(send())
+    return tuple(responses)
+
+
+@pytest.mark.parametrize("encoder", ["orjson", "json"])
+def test_dates_none_and_nested_models_match_the_response_model(monkeypatch, encoder):
+    if encoder == "json":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    app = FastAPI()
+    content = dict(events=[
+        dict(name="naive", at=datetime(2024, 1, 2, 3, 4, 5, 123456), note=None),
+        dict(name="utc", at=datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc), note='Ünïcode "quoted"'),
+        dict(name="offset", at=datetime(2024, 1, 2, 3, 4, 5, 1000, tzinfo=timezone(timedelta(hours=-5))), note="✓"),
+    ], next_cursor=None)
+
+    @app.get("/timeline", response_model=Timeline)
+    def timeline():
+        return public_response(content)
+
+    client = TestClient(app)
+    default, fast = both_modes(monkeypatch, lambda: client.get("/timeline"))
+    assert fast.status_code == default.status_code == 200
+    assert fast.content == default.content
+
+
+@pytest.mark.parametrize("request_of", [
+    lambda ids: ("GET", "/users/?limit=1000", None),
+    lambda ids: ("GET", "/users/page?limit=1000", None),
+    lambda ids: ("GET", f"/user/{ids[0]}", None),
+    lambda ids: ("POST", "/users/batch-get", ids + ["missing"]),
+    lambda ids: ("GET", "/users/search?q=N%C3%BA%C3%B1ez", None),
+    lambda ids: ("GET", "/roles/", None),
+])
+def test_endpoints_return_the_same_bytes(client, monkeypatch, request_of):
+    # nested roles, non ASCII values and quotes, next_cursor None on the last page
+    ids = insert_users(3, first_name='José "quoted"', last_name="Núñez")
+    method, url, body = request_of(ids)
+    default, fast = both_modes(monkeypatch, lambda: client.request(method, url, json=body))
+    assert fast.status_code == default.status_code == 200
+    assert fast.content == default.content
+    assert fast.headers.get("etag") == default.headers.get("etag")
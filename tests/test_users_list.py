@@ -0,0 +1,31 @@
+import uuid
+
+from sqlalchemy import select
+
+from benchmarks.common import count_queries
+from tests.common import insert_users
+
+
+def test_users_list_query_count_does_not_depend_on_page_size(client):
+    # all the users have roles: with lazy loading of User.roles each user of the page would add a query
+    from app.db.models.Role import Role
+    from app.db.models.User import User, user_role
+    from app.db.session import engine, engines
+
+    insert_users(40)
+    roles = [dict(public_id=str(uuid.uuid4()), name=f"List{uuid.uuid4().hex}", description="list", is_active=True)
+             for _ in range(2)]
+    with engine.begin() as conn:
+        conn.execute(Role.__table__.insert(), roles)
+        role_ids = conn.execute(select(Role.id).filter(Role.public_id.in_([r["public_id"] for r in roles]))).scalars()
+        user_ids = conn.execute(select(User.id).order_by(User.id).limit(40)).scalars().all()
+        conn.execute(user_role.insert(), [dict(user_id=u, role_id=r) for r in role_ids for u in user_ids])
+
+    queries = dict()
+    for limit in (5, 40):
+        with count_queries(*engines) as counter:
+            response = client.get("/users/", params=dict(limit=limit))
+        assert response.status_code == 200, response.text
+        assert len(response.json()) == limit and all(len(u["roles"]) >= 2 for u in response.json())
+        queries[limit] = counter["queries"]
+    assert queries[5] == queries[40], queries
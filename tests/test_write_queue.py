@@ -0,0 +1,82 @@
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import func, select
+
+from tests.common import send_concurrently
+
+
+def add_role(name: str, fail: bool = False):
+    # write operation: adds a role, or fails after adding it (only its savepoint is rolled back)
+    from app.db.models.Role import Role
+
+    def operation(session):
+        session.add(Role(name=name, description="queued", public_id=str(uuid.uuid4())))
+        if fail:
+            raise ValueError(name)
+        return name
+
+    return operation
+
+
+def count_roles(prefix: str) -> int:
+    from app.db.models.Role import Role
+    from app.db.session import engine
+
+    with engine.connect() as conn:
+        return conn.execute(select(func.count(Role.id)).filter(Role.name.like(f"{prefix}%"))).scalar()
+
+
+def test_concurrent_submits_are_committed_in_batches(api):
+    from app.core.config import settings
+    from app.db.write_queue import WriteQueue
+
+    writer = WriteQueue(settings.SQLALCHEMY_DATABASE_URL, window_seconds=0.005, max_batch=64)
+    prefix = f"Queued{uuid.uuid4().hex[:8]}_"
+    operations = [add_role(f"{prefix}{i}", fail=i % 25 == 0) for i in range(500)]
+    with ThreadPoolExecutor(50) as pool:
+        futures = list(pool.map(writer.submit, operations))
+    failed = [i for i, f in enumerate(futures) if f.exception(timeout=10) is not None]
+    writer.stop()
+    assert failed == list(range(0, 500, 25))
+    assert all(isinstance(futures[i].exception(), ValueError) for i in failed)
+    assert [f.result() for f in futures if f.exception() is None] == \
+           [f"{prefix}{i}" for i in range(500) if i % 25]
+    assert count_roles(prefix) == 500 - len(failed)
+    stats = writer.stats()
+    assert stats["operations"] == 500 and stats["failed"] == len(failed) and stats["failed_batches"] == 0
+    assert stats["batches"] < 500
+
+
+def test_concurrent_requests_with_write_queue(client, api, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "WRITE_QUEUE", True)
+    prefix = f"Request{uuid.uuid4().hex[:8]}_"
+    requests = [("POST", "/role/", dict(name=f"{prefix}{i}", description="queued")) for i in range(100)]
+    responses = asyncio.run(send_concurrently(api, requests))
+    assert [r.status_code for r in responses] == [200] * 100
+    assert count_roles(prefix.capitalize()) == 100
+
+
+def test_writer_that_can_not_start_fails_the_pending_operations(api, monkeypatch):
+    from app.core.config import settings
+    from app.db import write_queue
+
+    def broken_engine(url):
+        raise RuntimeError("can not open the database")
+
+    monkeypatch.setattr(write_queue, "_writer_engine", broken_engine)
+    writer = write_queue.WriteQueue(settings.SQLALCHEMY_DATABASE_URL, window_seconds=0.005, max_batch=64)
+    with ThreadPoolExecutor(10) as pool:
+        futures = list(pool.map(writer.submit, [add_role(f"Broken{i}") for i in range(50)]))
+    for future in futures:
+        with pytest.raises(RuntimeError, match="can not open"):
+            future.result(timeout=5)
+    # later operations fail at once instead of waiting for a writer that is gone
+    with pytest.raises(RuntimeError, match="can not open"):
+        writer.submit(add_role("Broken")).result(timeout=1)
+    writer.stop()
+    assert writer.stats()["failed"] == 51